@@ -1,11 +1,21 @@
 import os
+import random
+import threading
+import time
 
-from flask import Flask, render_template, request
+from flask import Flask, abort, jsonify, render_template, request
 
 from asset_data import ASSET_DATA
-from logic import (calculate_risk_score, categorize_risk_profile,
-                   recommend_equity_portfolio, recommend_mf_portfolio,
-                   recommend_multi_asset_portfolio_specific_funds)
+from coalesce import SingleFlight
+from logic import (CORRELATION_FIELDS, build_correlation_matrix,
+                   calculate_risk_score, catalog_version,
+                   categorize_risk_profile, changed_selections, diff_catalogs,
+                   materialize_recommendations, plan_sip,
+                   recommend_from_table, selection_keys, snapshot_catalog,
+                   stale_asset_ids, sweep_recommendations,
+                   update_recommendations)
+from store import DEFAULT_DB_PATH, RecommendationStore
+from tenants import build_tenant_catalogs, load_tenant_rules
 
 # from flask_cors import CORS
 
@@ -13,11 +23,110 @@ from logic import (calculate_risk_score, categorize_risk_profile,
 app = Flask(__name__)
 # CORS(app)
 
+store = RecommendationStore(os.environ.get("PORTFOLIO_DB_PATH", DEFAULT_DB_PATH))
+
+# Identical concurrent requests share one computation; set PORTFOLIO_COALESCE_DIR to also reuse results
+# other worker processes computed within the last second (a short-TTL cache rather than strict single-flight)
+coalescer = SingleFlight(os.environ.get("PORTFOLIO_COALESCE_DIR"))
+
+# How often (in seconds) a background thread checks ASSET_DATA for changes that require rebuilding the recommendation tables
+CATALOG_CHECK_INTERVAL = 30
+
+# Per-distributor catalog rules; the "tenant" key of a request selects one (shared catalog if none is given)
+TENANT_RULES = load_tenant_rules(os.environ["PORTFOLIO_TENANTS_PATH"]) if os.environ.get("PORTFOLIO_TENANTS_PATH") else {}
+
+# Catalog-derived state, kept up to date with ASSET_DATA by refresh_catalogs()
+CATALOG_VERSION = None
+CATALOG_SNAPSHOT = None
+TENANT_CATALOGS = {}
+STOCK_CORRELATION = None
+RECOMMENDATION_TABLES = {}  # tenant (None for the shared catalog) -> materialized recommendation table
+LAST_CATALOG_REFRESH = {}
+_refresh_lock = threading.Lock()
+
+
+def refresh_catalogs():
+    """
+    Brings tenant views, the correlation matrix, the materialized recommendation tables and stored
+    plans up to date with ASSET_DATA. In-place edits are applied incrementally (only entries holding
+    or able to pick a changed asset are re-selected); added, removed or reordered assets rebuild everything.
+    Either way, stored plans holding a changed or removed asset, or served from a selection that
+    now picks different assets, are invalidated.
+    """
+    global CATALOG_VERSION, CATALOG_SNAPSHOT, TENANT_CATALOGS, STOCK_CORRELATION, RECOMMENDATION_TABLES, LAST_CATALOG_REFRESH
+    with _refresh_lock:
+        # Version and diff both come from this snapshot, so edits made while the tables are being
+        # rebuilt are still pending against it and get picked up by the next refresh
+        snapshot = snapshot_catalog(ASSET_DATA)
+        copies = {asset_class: assets for asset_class, (_, assets) in snapshot.items()}
+        version = catalog_version(copies)
+        if version == CATALOG_VERSION:
+            return
+
+        started = time.perf_counter()
+        changes = diff_catalogs(CATALOG_SNAPSHOT, snapshot) if CATALOG_SNAPSHOT is not None else None
+        tenant_catalogs = build_tenant_catalogs(ASSET_DATA, TENANT_RULES)
+        catalogs = {None: ASSET_DATA, **tenant_catalogs}
+
+        if changes is None:
+            # Precomputed once for the shared catalog; tenant views pick their rows by ticker
+            correlation = build_correlation_matrix(ASSET_DATA["stocks"])
+            tables = {tenant: materialize_recommendations(catalog, correlation) for tenant, catalog in catalogs.items()}
+            report = {"mode": "rebuild"}
+        else:
+            changed_stock_fields = set().union(*(fields for asset_class, _, _, _, fields in changes if asset_class == "stocks"))
+            correlation = build_correlation_matrix(ASSET_DATA["stocks"]) if changed_stock_fields & CORRELATION_FIELDS else STOCK_CORRELATION
+            tables = {}
+            report = {"mode": "incremental", "changed_assets": len(changes), "entries": 0, "reselected": 0, "rebound": 0}
+            for tenant, catalog in catalogs.items():
+                tables[tenant], stats = update_recommendations(RECOMMENDATION_TABLES[tenant], changes, correlation, catalog)
+                for stat, count in stats.items():
+                    report[stat] += count
+
+        if CATALOG_SNAPSHOT is not None:
+            changed_keys = [
+                (tenant, *key)
+                for tenant, table in tables.items() if tenant in RECOMMENDATION_TABLES
+                for key in changed_selections(RECOMMENDATION_TABLES[tenant], table)
+            ]
+            report["plans_invalidated"] = (
+                store.invalidate_assets(stale_asset_ids(CATALOG_SNAPSHOT, copies), version)
+                + store.invalidate_selections(changed_keys, version)
+            )
+
+        TENANT_CATALOGS, STOCK_CORRELATION, RECOMMENDATION_TABLES = tenant_catalogs, correlation, tables
+        CATALOG_VERSION = version
+        CATALOG_SNAPSHOT = snapshot
+        LAST_CATALOG_REFRESH = {**report, "catalog_version": version, "seconds": time.perf_counter() - started}
+
+
+def watch_catalog():
+    """
+    Refreshes the catalog-derived state every CATALOG_CHECK_INTERVAL seconds. Runs off the request
+    path: requests keep using the current tables until refresh_catalogs() swaps in the new ones.
+    """
+    while True:
+        time.sleep(CATALOG_CHECK_INTERVAL)
+        try:
+            refresh_catalogs()
+        except Exception as e: # Keep the watcher alive; the current tables stay in use until the next check
+            print(f"Warning: Could not refresh the asset catalog: {e}")
+
+
+refresh_catalogs()
+threading.Thread(target=watch_catalog, name="catalog-watcher", daemon=True).start()
+
+
 @app.route('/', methods=['GET', 'POST'])
 def index():
     if request.method == 'POST':
         data = request.form
 
+        tenant = request.values.get('tenant') or None
+        table = RECOMMENDATION_TABLES.get(tenant)
+        if table is None:
+            abort(404, description=f"Unknown tenant '{tenant}'")
+
         user_profile = {
             "drawdown": float(data['drawdown']),
             "salary": float(data['salary']),
@@ -31,33 +140,110 @@ def index():
         risk_score = calculate_risk_score(user_profile)
         risk_profile = categorize_risk_profile(risk_score)
 
-        if user_profile['investment_type'] == 'Equity':
-            portfolio = recommend_equity_portfolio(
+        def recommend():
+            # Every draw comes from a generator private to this request, so the stored seed reproduces the plan
+            seed = random.randrange(2**32)
+            # Selection comes from the materialized table; only the unit allocation depends on the amount
+            return seed, recommend_from_table(
+                table,
                 risk_profile,
+                user_profile["investment_type"],
                 user_profile["sector_preference"],
                 user_profile["total_investment_amount"],
-                ASSET_DATA
+                rng=random.Random(seed)
             )
-        elif user_profile['investment_type'] == 'Mutual Funds':
-            portfolio = recommend_mf_portfolio(
-                risk_profile,
-                user_profile["sector_preference"],
-                ASSET_DATA
-            )
-        else:
-            portfolio = recommend_multi_asset_portfolio_specific_funds(
-                risk_profile,
-                user_profile["total_investment_amount"],
-                user_profile["sector_preference"],
-                ASSET_DATA
+
+        # The recommendation only depends on these, so requests agreeing on them share one computation
+        sector_preference = user_profile["sector_preference"]
+        coalesce_key = (
+            table["catalog_version"],
+            risk_profile,
+            user_profile["investment_type"],
+            sector_preference.lower() if sector_preference else None,
+            user_profile["total_investment_amount"]
+        )
+        seed, portfolio = coalescer.do(coalesce_key, recommend)
+
+        # Optional SIP projection on top of the recommended portfolio
+        sip = None
+        if data.get('sip_monthly_amount') and data.get('sip_years'):
+            sip = plan_sip(
+                portfolio,
+                float(data['sip_monthly_amount']),
+                int(data['sip_years']),
+                float(data.get('sip_step_up') or 0) / 100
             )
 
-        return render_template("index.html", result=portfolio, profile=risk_profile, score=risk_score, user=user_profile)
+        plan_id = store.save(
+            {**user_profile, "tenant": tenant}, risk_score, risk_profile, portfolio, table["catalog_version"],
+            seed=seed, client_id=data.get('client_id') or None,
+            selection_keys=[(tenant, *key) for key in selection_keys(risk_profile, user_profile["investment_type"], sector_preference)]
+        )
+
+        return render_template("index.html", result=portfolio, profile=risk_profile, score=risk_score, user=user_profile, sip=sip, plan_id=plan_id)
 
     # ✅ Fix: Return something for GET requests
     return render_template("index.html", result=None, user={})
 
 
+@app.route('/sweep', methods=['POST'])
+def sweep():
+    """
+    What-if sweep: takes {"profile": {...}, "ranges": {field: [values] or {"start", "stop", "step"}}}
+    and returns the risk profile and portfolio for every combination of the swept fields, plus the
+    seed its random draws came from.
+    """
+    data = request.get_json(silent=True) or {}
+    if not isinstance(data, dict):
+        abort(400, description="The sweep request must be a JSON object.")
+    table = RECOMMENDATION_TABLES.get(data.get('tenant') or None)
+    if table is None:
+        abort(404, description=f"Unknown tenant '{data.get('tenant')}'")
+
+    profile = data.get('profile', {})
+    ranges = data.get('ranges', {})
+    if not isinstance(profile, dict) or not isinstance(ranges, dict):
+        abort(400, description="'profile' and 'ranges' must be JSON objects.")
+    missing = [f for f in ("drawdown", "salary", "dependents", "age", "investment_type", "total_investment_amount") if f not in profile and f not in ranges]
+    if missing:
+        abort(400, description=f"Missing profile fields: {', '.join(missing)}")
+
+    # As in index(), draws come from a generator private to this request, seeded so the sweep can be reproduced
+    seed = random.randrange(2**32)
+    try:
+        result = sweep_recommendations(profile, ranges, table, rng=random.Random(seed))
+    except (TypeError, ValueError, OverflowError) as e:
+        abort(400, description=str(e))
+    return jsonify({**result, "seed": seed})
+
+
+@app.route('/metrics/coalescing')
+def coalescing_metrics():
+    """Reports how many recommendation computations request coalescing saved in this worker."""
+    return jsonify(coalescer.metrics())
+
+
+@app.route('/metrics/catalog')
+def catalog_metrics():
+    """Reports what the last catalog refresh re-selected, rebound and invalidated."""
+    return jsonify(LAST_CATALOG_REFRESH)
+
+
+@app.route('/plan/<plan_id>')
+def stored_plan(plan_id):
+    """Shows a previously generated plan from the store, without re-running the recommenders."""
+    plan = store.get(plan_id)
+    if plan is None:
+        abort(404)
+    return render_template("index.html", result=plan["portfolio"], profile=plan["risk_profile"], score=plan["risk_score"], user=plan["user_profile"], plan_id=plan_id, invalidated=plan["invalidated_at"] is not None)
+
+
+@app.route('/client/<client_id>/plans')
+def client_plans(client_id):
+    """Lists a client's stored plans, newest first."""
+    return jsonify(store.list_for_client(client_id, limit=request.args.get('limit', 20, type=int)))
+
+
 if __name__ == "__main__":
     port = int(os.environ.get("PORT", 5001))
     app.run(debug=False, host='0.0.0.0', port=port)
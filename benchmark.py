@@ -0,0 +1,74 @@
+"""
+Micro-benchmarks for the recommendation paths.
+
+Usage: python benchmark.py
+"""
+import copy
+import random
+import time
+import timeit
+
+from asset_data import ASSET_DATA
+from logic import (RISK_PROFILES, allocate_mf_units, build_correlation_matrix,
+                   diff_catalogs, materialize_recommendations,
+                   recommend_core_satellite_portfolio,
+                   recommend_equity_portfolio, recommend_from_table,
+                   recommend_mf_portfolio, snapshot_catalog,
+                   update_recommendations)
+
+
+def bench(label, fn, number=2000):
+    seconds = timeit.timeit(fn, number=number) / number
+    print(f"{label:<45} {seconds * 1e6:>10.1f} µs/request")
+    return seconds
+
+
+def bench_materialized_tables(number=2000):
+    """Compares live selection against a lookup in the materialized recommendation table."""
+    correlation = build_correlation_matrix(ASSET_DATA["stocks"])
+    seconds = timeit.timeit(lambda: materialize_recommendations(ASSET_DATA, correlation), number=5) / 5
+    print(f"{'Materialize tables (once per catalog)':<45} {seconds * 1e3:>10.1f} ms")
+
+    table = materialize_recommendations(ASSET_DATA, correlation)
+    live_paths = {
+        "Equity": lambda p, amount: recommend_equity_portfolio(p, None, amount, ASSET_DATA, correlation=correlation),
+        "Mutual Funds": lambda p, amount: allocate_mf_units(recommend_mf_portfolio(p, None, ASSET_DATA), amount),
+        "Core Satellite": lambda p, amount: recommend_core_satellite_portfolio(p, None, amount, ASSET_DATA, correlation=correlation),
+    }
+    for investment_type, live in live_paths.items():
+        requests = [(random.choice(RISK_PROFILES), random.choice([25000, 100000, 500000])) for _ in range(number)]
+        live_requests = iter(requests)
+        table_requests = iter(requests)
+
+        def from_table(risk_profile, amount):
+            return recommend_from_table(table, risk_profile, investment_type, None, amount)
+
+        live_time = bench(f"{investment_type} (live selection)", lambda: live(*next(live_requests)), number)
+        table_time = bench(f"{investment_type} (materialized table)", lambda: from_table(*next(table_requests)), number)
+        print(f"{'':<45} {live_time / table_time:>10.1f}x faster")
+
+
+def bench_incremental_invalidation(fraction=0.05):
+    """Updates a fraction of instruments and compares incremental table updates against a full rebuild."""
+    catalog = copy.deepcopy(ASSET_DATA)
+    correlation = build_correlation_matrix(catalog["stocks"])
+    table = materialize_recommendations(catalog, correlation)
+    instruments = [asset for assets in catalog.values() for asset in assets]
+
+    for label, field, change in [("NAV/price update", "price", lambda v: v * 1.01), ("Predicted return update", "predicted_return", lambda v: v + 0.01)]:
+        snapshot = snapshot_catalog(catalog)
+        for asset in random.sample(instruments, max(1, int(len(instruments) * fraction))):
+            asset[field] = change(asset[field])
+        started = time.perf_counter()
+        table, stats = update_recommendations(table, diff_catalogs(snapshot, snapshot_catalog(catalog)), correlation)
+        incremental = time.perf_counter() - started
+        started = time.perf_counter()
+        materialize_recommendations(catalog, correlation)
+        rebuild = time.perf_counter() - started
+        print(f"{label} ({fraction:.0%} of instruments): re-selected {stats['reselected']}/{stats['entries']} entries, "
+              f"{incremental * 1e3:.2f} ms vs {rebuild * 1e3:.2f} ms full rebuild")
+
+
+if __name__ == "__main__":
+    bench_materialized_tables()
+    bench_incremental_invalidation()
@@ -0,0 +1,157 @@
+import hashlib
+import json
+import os
+import threading
+import time
+
+try:
+    import fcntl
+except ImportError: # Not available on Windows; coalescing then stays in-process
+    fcntl = None
+
+# Results written by another worker process are reused for this many seconds
+DEFAULT_SHARE_WINDOW = 1.0
+
+# Number of lock files keys are hashed onto (keys sharing a slot just compute one after the other)
+LOCK_SLOTS = 64
+
+# How often (in seconds) each process removes expired result files from lock_dir
+CLEANUP_INTERVAL = 30.0
+
+
+class _Call:
+    __slots__ = ("done", "result", "error")
+
+    def __init__(self):
+        self.done = threading.Event()
+        self.result = None
+        self.error = None
+
+
+class SingleFlight:
+    """
+    Coalesces identical concurrent computations. Threads asking for a key that is already being
+    computed wait for that computation and share its result, which callers must not mutate.
+    With a lock_dir, worker processes also share results, though not as strict single-flight:
+    the computing thread of each process takes one of LOCK_SLOTS file locks (by key hash), and
+    any result written for the key within the last share_window seconds is reused, whether or not
+    it was computed concurrently. Across processes this is a short-TTL result cache (results must
+    be JSON-serializable); expired result files are removed every CLEANUP_INTERVAL seconds.
+    Result files record the pid that wrote them, so reusing another worker's result is counted
+    apart from reusing one this process wrote for an earlier request.
+    """
+
+    def __init__(self, lock_dir=None, share_window=DEFAULT_SHARE_WINDOW):
+        self.lock_dir = lock_dir if fcntl is not None else None
+        self.share_window = share_window
+        if self.lock_dir:
+            os.makedirs(self.lock_dir, exist_ok=True)
+
+        self._calls = {}
+        self._lock = threading.Lock()
+        self._next_cleanup = time.monotonic() + CLEANUP_INTERVAL
+        self.requests = 0
+        self.computations = 0
+        self.coalesced_in_process = 0
+        self.coalesced_across_processes = 0
+        self.cached_in_process = 0
+
+    def do(self, key, fn):
+        """Returns fn()'s result for key, computing it at most once across concurrent callers."""
+        with self._lock:
+            self.requests += 1
+            call = self._calls.get(key)
+            leader = call is None
+            if leader:
+                call = self._calls[key] = _Call()
+
+        if not leader:
+            call.done.wait()
+            with self._lock:
+                self.coalesced_in_process += 1
+            if call.error is not None:
+                raise call.error
+            return call.result
+
+        try:
+            call.result = self._compute(key, fn)
+            return call.result
+        except Exception as e:
+            call.error = e
+            raise
+        finally:
+            with self._lock:
+                del self._calls[key]
+            call.done.set()
+
+    def _compute(self, key, fn):
+        if not self.lock_dir:
+            return self._run(fn)
+
+        self._cleanup()
+        digest = hashlib.sha1(repr(key).encode("utf-8")).hexdigest()
+        path = os.path.join(self.lock_dir, digest)
+        slot = int(digest[:8], 16) % LOCK_SLOTS
+        with open(os.path.join(self.lock_dir, f"slot-{slot:02d}.lock"), "a") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                try:
+                    if time.time() - os.path.getmtime(path + ".json") <= self.share_window:
+                        with open(path + ".json", encoding="utf-8") as f:
+                            shared = json.load(f)
+                        with self._lock:
+                            if shared["pid"] == os.getpid():
+                                self.cached_in_process += 1
+                            else:
+                                self.coalesced_across_processes += 1
+                        return shared["result"]
+                except (OSError, ValueError, KeyError, TypeError):
+                    pass # No fresh result from another process; compute it here
+
+                result = self._run(fn)
+                tmp_path = f"{path}.{os.getpid()}.tmp"
+                with open(tmp_path, "w", encoding="utf-8") as f:
+                    json.dump({"pid": os.getpid(), "result": result}, f, ensure_ascii=False)
+                os.replace(tmp_path, path + ".json")
+                return result
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _cleanup(self):
+        """Removes expired result files (and temp files left behind by crashed workers) from lock_dir."""
+        with self._lock:
+            now = time.monotonic()
+            if now < self._next_cleanup:
+                return
+            self._next_cleanup = now + CLEANUP_INTERVAL
+        now = time.time()
+        for entry in os.scandir(self.lock_dir):
+            if entry.name.endswith(".json"):
+                max_age = self.share_window
+            elif entry.name.endswith(".tmp"):
+                max_age = CLEANUP_INTERVAL
+            else:
+                continue
+            try:
+                if now - entry.stat().st_mtime > max_age:
+                    os.remove(entry.path)
+            except OSError:
+                pass # Already replaced or removed by another process
+
+    def _run(self, fn):
+        result = fn()
+        with self._lock:
+            self.computations += 1
+        return result
+
+    def metrics(self):
+        """Counts of requests, actual computations and computations saved by coalescing or by reusing this process's own results."""
+        with self._lock:
+            return {
+                "requests": self.requests,
+                "computations": self.computations,
+                "coalesced_in_process": self.coalesced_in_process,
+                "coalesced_across_processes": self.coalesced_across_processes,
+                "cached_in_process": self.cached_in_process,
+                "computations_saved": self.coalesced_in_process + self.coalesced_across_processes + self.cached_in_process,
+            }
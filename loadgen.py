@@ -0,0 +1,216 @@
+"""
+Synthetic catalogs, user-profile streams and a load driver for scale testing.
+
+Usage:
+    python loadgen.py --rps 50 --duration 20 --stocks 5000 --mutual-funds 2000
+    python loadgen.py --rps 50 --duration 20 --url http://127.0.0.1:5001/
+    python loadgen.py --rps 50 --duration 20 --history-db recommendations.db
+"""
+import argparse
+import math
+import os
+import random
+import resource
+import statistics
+import tempfile
+import threading
+import time
+import urllib.parse
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from asset_data import ASSET_DATA
+from store import RecommendationStore
+
+INVESTMENT_TYPES = ["Equity", "Mutual Funds", "Multi Asset Allocation", "Core Satellite"]
+
+
+def generate_catalog(num_stocks=None, num_mutual_funds=None, num_equity_etfs=None, num_debt_funds=None, num_gold_etfs=None, seed=None):
+    """
+    Generates a catalog with the same schema as ASSET_DATA at any size. Each synthetic asset is
+    bootstrapped from a random real asset of the same class (so market cap, sector, category,
+    volatility and AMC keep their joint distribution), with its price and predicted return jittered.
+    Sizes left as None keep the real catalog's size.
+    """
+    rng = random.Random(seed)
+    sizes = {
+        "stocks": num_stocks,
+        "mutual_funds": num_mutual_funds,
+        "equity_etfs_index_funds": num_equity_etfs,
+        "debt_etfs_index_funds": num_debt_funds,
+        "gold_etfs": num_gold_etfs,
+    }
+
+    catalog = {}
+    for asset_class, templates in ASSET_DATA.items():
+        size = len(templates) if sizes.get(asset_class) is None else sizes[asset_class]
+        assets = []
+        for i in range(size):
+            template = rng.choice(templates)
+            asset = {
+                **template,
+                "name": f"{template['name']} #{i + 1}",
+                # Prices are roughly log-normal: multiplicative jitter keeps them positive and skewed
+                "price": round(template["price"] * math.exp(rng.gauss(0, 0.35)), 2),
+                "predicted_return": round(max(0.01, template["predicted_return"] + rng.gauss(0, 0.015)), 3),
+            }
+            if template.get("ticker"):
+                asset["ticker"] = f"{template['ticker'].split('.')[0]}{i + 1}.SYN"
+            assets.append(asset)
+        catalog[asset_class] = assets
+    return catalog
+
+
+def generate_profiles(count, seed=None, history=None):
+    """
+    Generates index() form submissions. With history (stored user profiles, e.g. from
+    RecommendationStore) profiles are resampled from it; otherwise fields follow default
+    distributions of our users: mostly salaried 25-45 year olds, round investment amounts.
+    """
+    rng = random.Random(seed)
+    profiles = []
+    for _ in range(count):
+        if history:
+            past = rng.choice(history)
+            profile = {field: past[field] for field in ("drawdown", "salary", "dependents", "age", "investment_type", "total_investment_amount")}
+            profile["sector_preference"] = past.get("sector_preference") or "None"
+        else:
+            profile = {
+                "drawdown": rng.choice([5, 10, 15, 20, 25, 30, 40, 50]),
+                "salary": round(math.exp(rng.gauss(math.log(1200000), 0.7)), -4),
+                "dependents": min(int(rng.expovariate(0.6)), 8),
+                "age": min(max(int(rng.gauss(35, 10)), 18), 80),
+                "investment_type": rng.choices(INVESTMENT_TYPES, weights=[35, 40, 15, 10])[0],
+                "sector_preference": "None" if rng.random() < 0.8 else rng.choice(sorted({s["sector"] for s in ASSET_DATA["stocks"]})),
+                "total_investment_amount": rng.choice([10000, 25000, 50000, 100000, 200000, 500000, 1000000]),
+            }
+        profiles.append({field: str(value) for field, value in profile.items()})
+    return profiles
+
+
+def current_rss_kib():
+    """Resident set size of this process in KiB (peak RSS where /proc isn't available)."""
+    try:
+        with open("/proc/self/status") as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return int(line.split()[1])
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+
+def percentile(sorted_values, pct):
+    if not sorted_values:
+        return 0.0
+    return sorted_values[min(len(sorted_values) - 1, int(round(pct / 100 * (len(sorted_values) - 1))))]
+
+
+def run_load(profiles, rps, url=None, workers=32):
+    """
+    Replays profiles as POSTs to index() at a target rate (open loop: request i is sent at
+    i / rps seconds whether or not earlier ones have finished). Latency is measured from that
+    scheduled send time, so time spent queued behind busy workers counts against the server
+    instead of being hidden (coordinated omission). Without a url the Flask app is driven
+    in-process, which also lets us measure its memory growth.
+    """
+    if url is None:
+        from app import app
+        local = threading.local()
+
+        def send(form):
+            client = getattr(local, "client", None)
+            if client is None:
+                client = local.client = app.test_client()
+            return client.post("/", data=form).status_code
+    else:
+        def send(form):
+            body = urllib.parse.urlencode(form).encode("utf-8")
+            with urllib.request.urlopen(url, data=body, timeout=30) as response:
+                return response.status
+
+    latencies = []
+    errors = []
+    lock = threading.Lock()
+
+    def timed_send(form, scheduled):
+        try:
+            status = send(form)
+            failed = status >= 400
+        except Exception:
+            failed = True
+        elapsed = time.perf_counter() - scheduled
+        with lock:
+            latencies.append(elapsed)
+            if failed:
+                errors.append(elapsed)
+
+    rss_before = current_rss_kib()
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        for i, form in enumerate(profiles):
+            scheduled = started + i / rps
+            delay = scheduled - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            pool.submit(timed_send, form, scheduled)
+    elapsed = time.perf_counter() - started
+    rss_after = current_rss_kib()
+
+    latencies.sort()
+    return {
+        "requests": len(latencies),
+        "errors": len(errors),
+        "target_rps": rps,
+        "throughput_rps": len(latencies) / elapsed if elapsed > 0 else 0.0,
+        "latency_ms": {
+            "mean": statistics.fmean(latencies) * 1000 if latencies else 0.0,
+            "p50": percentile(latencies, 50) * 1000,
+            "p90": percentile(latencies, 90) * 1000,
+            "p99": percentile(latencies, 99) * 1000,
+            "max": latencies[-1] * 1000 if latencies else 0.0,
+        },
+        # Growth of this process's resident memory over the run (the server's own, when driven in-process)
+        "rss_before_kib": rss_before,
+        "rss_growth_kib": rss_after - rss_before,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay synthetic traffic against the portfolio recommender.")
+    parser.add_argument("--rps", type=float, default=20, help="target requests per second")
+    parser.add_argument("--duration", type=float, default=10, help="seconds of traffic to replay")
+    parser.add_argument("--url", help="POST to a running server instead of driving app.py in-process")
+    parser.add_argument("--workers", type=int, default=32)
+    parser.add_argument("--seed", type=int)
+    parser.add_argument("--history-db", help="resample profiles from a recommendation database instead of the default distributions")
+    parser.add_argument("--stocks", type=int, help="synthetic catalog size (in-process only)")
+    parser.add_argument("--mutual-funds", type=int, help="synthetic catalog size (in-process only)")
+    args = parser.parse_args()
+
+    if args.url is None:
+        # Keep load-test plans out of the real recommendation database
+        os.environ.setdefault("PORTFOLIO_DB_PATH", os.path.join(tempfile.mkdtemp(), "loadgen.db"))
+        if args.stocks is not None or args.mutual_funds is not None:
+            catalog = generate_catalog(num_stocks=args.stocks, num_mutual_funds=args.mutual_funds, seed=args.seed)
+            # Swap the synthetic catalog in place so app.py (which shares ASSET_DATA) picks it up
+            ASSET_DATA.clear()
+            ASSET_DATA.update(catalog)
+
+    history = None
+    if args.history_db:
+        history_store = RecommendationStore(args.history_db)
+        history = history_store.recent_profiles()
+        history_store.close()
+    profiles = generate_profiles(int(args.rps * args.duration), seed=args.seed, history=history)
+    report = run_load(profiles, args.rps, url=args.url, workers=args.workers)
+
+    print(f"Requests:     {report['requests']} ({report['errors']} errors)")
+    print(f"Throughput:   {report['throughput_rps']:.1f} req/s (target {report['target_rps']:.1f})")
+    latency = report["latency_ms"]
+    print(f"Latency (ms): mean {latency['mean']:.1f}, p50 {latency['p50']:.1f}, p90 {latency['p90']:.1f}, p99 {latency['p99']:.1f}, max {latency['max']:.1f}")
+    print(f"Memory:       {report['rss_before_kib']} KiB RSS at start, {report['rss_growth_kib']:+d} KiB growth")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,42 @@
+import hashlib
+import heapq
+import json
+import math
 import random
+from array import array
+from itertools import accumulate, product
+from operator import truediv
+
+# Minimum lump-sum / SIP amount per mutual fund (in INR), used when a fund doesn't specify its own "min_investment"
+MF_MIN_INVESTMENT = 500
+
+# Target number of stocks in an equity portfolio
+EQUITY_PORTFOLIO_SIZE = 7
+
+# How much predicted return a stock gives up per unit of correlation with the stocks already selected
+DIVERSIFICATION_PENALTY = 0.1
+
+RISK_PROFILES = ["Low Risk 🛡️", "Medium Risk ⚖️", "High Risk 🚀"]
+
+# Number of precomputed draws kept per key for the randomized (mutual fund) selections
+MATERIALIZED_VARIANTS = 8
+
+# Seed of the precomputed mutual fund draws, so a table built from the same catalog always draws the same selections
+MATERIALIZATION_SEED = 0
+
+# Asset fields that only affect unit allocation; changes to any other field can change which assets are selected.
+# Stock prices are the exception when they reorder stocks with tied predicted returns (see price_tie_breaks)
+ALLOCATION_ONLY_FIELDS = {"price"}
+
+# Share of the investment held in the low-cost index core of a core-satellite portfolio
+CORE_WEIGHTS = {"Low Risk 🛡️": 0.70, "Medium Risk ⚖️": 0.60, "High Risk 🚀": 0.40}
+
+# Index ETF / index fund categories eligible for the core, by risk profile
+CORE_CATEGORIES = {
+    "Low Risk 🛡️": ["Large Cap Index ETF", "Large Cap Index Fund"],
+    "Medium Risk ⚖️": ["Large Cap Index ETF", "Large Cap Index Fund", "Mid Cap Index ETF"],
+    "High Risk 🚀": ["Large Cap Index ETF", "Mid Cap Index ETF", "International Index ETF"],
+}
 
 
 def get_user_input():
@@ -41,15 +79,16 @@ def get_user_input():
             print("Invalid input. Please enter a valid age (18-100).")
 
     investment_type_choice = ""
-    while investment_type_choice not in ["1", "2", "3"]:
-        investment_type_choice = input("What type of investment are you interested in? (Equity (1), Mutual Funds (2), Multi Asset Allocation (3)): ")
-        if investment_type_choice not in ["1", "2", "3"]:
-            print("Invalid input. Please choose 1, 2, or 3.")
+    while investment_type_choice not in ["1", "2", "3", "4"]:
+        investment_type_choice = input("What type of investment are you interested in? (Equity (1), Mutual Funds (2), Multi Asset Allocation (3), Core Satellite (4)): ")
+        if investment_type_choice not in ["1", "2", "3", "4"]:
+            print("Invalid input. Please choose 1, 2, 3, or 4.")
 
     investment_type_map = {
         "1": "Equity",
         "2": "Mutual Funds",
-        "3": "Multi Asset Allocation"
+        "3": "Multi Asset Allocation",
+        "4": "Core Satellite"
     }
     investment_type = investment_type_map[investment_type_choice]
 
@@ -77,43 +116,58 @@ def get_user_input():
         "total_investment_amount": total_investment_amount
     }
 
-def calculate_risk_score(user_data):
-    """Calculates the risk score based on user input and predefined rules."""
-    risk_score = 0
-
-    # Drawdown rules
-    if user_data["drawdown"] <= 10:
-        risk_score += 1
-    elif 10 < user_data["drawdown"] <= 30:
-        risk_score += 2
+def catalog_version(ASSET_DATA):
+    """Returns a short content hash identifying the asset catalog (or tenant catalog view) the recommendations were built from."""
+    catalog = {asset_class: ASSET_DATA[asset_class] for asset_class in ASSET_DATA}
+    return hashlib.sha1(json.dumps(catalog, sort_keys=True).encode("utf-8")).hexdigest()[:12]
+
+def drawdown_score(drawdown):
+    """Risk points for the maximum acceptable drawdown (in %)."""
+    if drawdown <= 10:
+        return 1
+    elif 10 < drawdown <= 30:
+        return 2
     else:  # drawdown > 30
-        risk_score += 3
-
-    # Salary rules
-    if user_data["salary"] <= 1200000:
-        risk_score += 1
-    elif 1200000 < user_data["salary"] <= 3600000:
-        risk_score += 2
+        return 3
+
+def salary_score(salary):
+    """Risk points for the annual salary (in INR)."""
+    if salary <= 1200000:
+        return 1
+    elif 1200000 < salary <= 3600000:
+        return 2
     else:  # salary > 3600000
-        risk_score += 3
-
-    # Dependents rules
-    if user_data["dependents"] <= 2:
-        risk_score += 3
-    elif 2 < user_data["dependents"] <= 5:
-        risk_score += 2
+        return 3
+
+def dependents_score(dependents):
+    """Risk points for the number of dependents."""
+    if dependents <= 2:
+        return 3
+    elif 2 < dependents <= 5:
+        return 2
     else: # dependents > 5
-        risk_score += 1
-
-    # Age rules
-    if user_data["age"] <= 40:
-        risk_score += 3
-    elif 40 < user_data["age"] <= 60:
-        risk_score += 2
+        return 1
+
+def age_score(age):
+    """Risk points for the investor's age."""
+    if age <= 40:
+        return 3
+    elif 40 < age <= 60:
+        return 2
     else: # age > 60
-        risk_score += 1
+        return 1
 
-    return risk_score
+# Each profile field contributes independently to the risk score
+RISK_SCORE_RULES = {
+    "drawdown": drawdown_score,
+    "salary": salary_score,
+    "dependents": dependents_score,
+    "age": age_score,
+}
+
+def calculate_risk_score(user_data):
+    """Calculates the risk score based on user input and predefined rules."""
+    return sum(rule(user_data[field]) for field, rule in RISK_SCORE_RULES.items())
 
 def categorize_risk_profile(risk_score):
     """Categorizes the user's risk profile based on the calculated risk score."""
@@ -124,15 +178,95 @@ def categorize_risk_profile(risk_score):
     else:
         return "High Risk 🚀"
 
+# --- Diversification ---
+
+class CorrelationMatrix:
+    """
+    Pairwise stock correlations. The proxy correlation only depends on each stock's
+    (sector, market cap, volatility) bucket, so values are stored per pair of buckets as a
+    flat float32 array and each ticker indexes its bucket's row, keeping the matrix small
+    and linear to build in the number of stocks.
+    """
+
+    def __init__(self, ticker_buckets, buckets, values):
+        self.index = ticker_buckets  # ticker -> bucket
+        self.buckets = list(buckets)
+        self.size = len(self.buckets)
+        self.values = array("f", values)
+
+    def correlation(self, ticker_a, ticker_b):
+        if ticker_a == ticker_b:
+            return 1.0
+        return self.values[self.index[ticker_a] * self.size + self.index[ticker_b]]
+
+# Stock fields the proxy correlation matrix is derived from
+CORRELATION_FIELDS = {"sector", "market_cap", "volatility"}
+
+def build_correlation_matrix(stocks):
+    """
+    Builds a proxy correlation matrix from catalog attributes (no price history is available):
+    stocks move with the market, more so within a sector, market-cap bucket or volatility bucket.
+    """
+    def correlation(a, b):
+        sector_a, market_cap_a, volatility_a = a
+        sector_b, market_cap_b, volatility_b = b
+        corr = 0.75 if sector_a == sector_b else 0.3
+        if market_cap_a == market_cap_b:
+            corr += 0.1
+        if volatility_a == volatility_b:
+            corr += 0.05
+        return min(corr, 0.95)
+
+    buckets = {}
+    ticker_buckets = {
+        s["ticker"]: buckets.setdefault((s.get("sector"), s.get("market_cap"), s.get("volatility")), len(buckets))
+        for s in stocks if s.get("ticker")
+    }
+    return CorrelationMatrix(ticker_buckets, buckets, [correlation(a, b) for a in buckets for b in buckets])
+
+def select_diversified(candidates, num_to_select, correlation, penalty=DIVERSIFICATION_PENALTY):
+    """
+    Greedily picks the candidate with the best predicted return net of a penalty for its highest
+    correlation with the stocks already picked. A candidate's net return can only fall as picks are
+    added, so candidates sit in a heap keyed by their last known net return and only the top one is
+    re-scored against the new picks (lazy greedy), instead of re-evaluating all pairs each step.
+    """
+    values, size = correlation.values, correlation.size
+    # Candidates missing from the matrix are treated as uncorrelated with everything
+    positions = [correlation.index.get(c.get("ticker"), -1) for c in candidates]
+    returns = [c["predicted_return"] for c in candidates]
+
+    heap = [(-r, i, 0) for i, r in enumerate(returns)]  # (-net return, candidate, picks it was scored against)
+    heapq.heapify(heap)
+    selected = []
+    selected_rows = []
+    while heap and len(selected) < num_to_select:
+        _, i, scored_against = heapq.heappop(heap)
+        if scored_against == len(selected):
+            selected.append(candidates[i])
+            if positions[i] >= 0:
+                selected_rows.append(positions[i] * size)
+            continue
+        p = positions[i]
+        worst = max((values[row + p] for row in selected_rows), default=0.0) if p >= 0 else 0.0
+        heapq.heappush(heap, (penalty * worst - returns[i], i, len(selected)))
+    return selected
+
 # --- Portfolio Recommendation Functions ---
 
-def recommend_equity_portfolio(risk_profile, sector_preference, total_investment_amount, ASSET_DATA):
+def recommend_equity_portfolio(risk_profile, sector_preference, total_investment_amount, ASSET_DATA, correlation=None):
     """
     Recommends an equity portfolio based on risk and sector preference,
     ensuring each stock receives at least one unit where possible, and
     allocating the total investment amount effectively.
+    If a correlation matrix is given, stocks are picked for return net of
+    correlation with the stocks already picked instead of return alone.
     """
-    recommended_stocks = []
+    selected_stocks = select_equity_portfolio(risk_profile, sector_preference, ASSET_DATA, correlation)
+    return allocate_equity_units(selected_stocks, total_investment_amount)
+
+def select_equity_portfolio(risk_profile, sector_preference, ASSET_DATA, correlation=None):
+    """Selects the stocks for an equity portfolio (independent of the investment amount)."""
     available_stocks = ASSET_DATA["stocks"]
 
     if sector_preference:
@@ -144,9 +278,9 @@ def recommend_equity_portfolio(risk_profile, sector_preference, total_investment
 
     # Sort stocks by price (ascending) for initial allocation, then by predicted return (descending)
     # This helps ensure lower-priced stocks can get at least 1 unit more easily.
-    available_stocks.sort(key=lambda x: (x["price"], -x["predicted_return"]))
+    available_stocks = sorted(available_stocks, key=lambda x: (x["price"], -x["predicted_return"]))
 
-    num_stocks_to_recommend = 7 # Target number of stocks
+    num_stocks_to_recommend = EQUITY_PORTFOLIO_SIZE
 
     # Filter stocks based on risk profile and market cap
     if risk_profile == "High Risk 🚀":
@@ -159,7 +293,10 @@ def recommend_equity_portfolio(risk_profile, sector_preference, total_investment
     # Select the top N eligible stocks based on predicted return (after initial price sorting)
     # Re-sort to pick the highest predicted return among eligible ones for final selection
     eligible_stocks.sort(key=lambda x: x["predicted_return"], reverse=True)
-    selected_stocks = eligible_stocks[:min(num_stocks_to_recommend, len(eligible_stocks))]
+    if correlation is not None:
+        selected_stocks = select_diversified(eligible_stocks, num_stocks_to_recommend, correlation)
+    else:
+        selected_stocks = eligible_stocks[:min(num_stocks_to_recommend, len(eligible_stocks))]
 
     # If not enough stocks were selected based on risk/sector, try to fill from general large caps
     if len(selected_stocks) < num_stocks_to_recommend and risk_profile != "High Risk 🚀":
@@ -172,12 +309,16 @@ def recommend_equity_portfolio(risk_profile, sector_preference, total_investment
     # Ensure selected stocks are unique
     final_selected_portfolio = list({frozenset(item.items()): item for item in selected_stocks}.values())
     final_selected_portfolio.sort(key=lambda x: x["predicted_return"], reverse=True) # Final sort by return for display
+    return final_selected_portfolio
 
-
-    # Allocate units and calculate cost
+def allocate_equity_units(selected_stocks, total_investment_amount):
+    """
+    Allocates whole units of the selected stocks, giving at least one unit to each
+    stock where possible and then spreading the remaining amount by predicted return.
+    """
     allocated_portfolio = []
     remaining_investment = total_investment_amount
-    num_assets = len(final_selected_portfolio)
+    num_assets = len(selected_stocks)
 
     if num_assets == 0:
         return []
@@ -186,7 +327,7 @@ def recommend_equity_portfolio(risk_profile, sector_preference, total_investment
     # then distribute the remaining amount.
     
     # Sort by price ascending for initial unit allocation
-    final_selected_portfolio.sort(key=lambda x: x["price"])
+    final_selected_portfolio = sorted(selected_stocks, key=lambda x: x["price"])
 
     # First pass: Allocate 1 unit to each if affordable
     for asset in final_selected_portfolio:
@@ -232,8 +373,11 @@ def recommend_equity_portfolio(risk_profile, sector_preference, total_investment
 
     return allocated_portfolio
 
-def recommend_mf_portfolio(risk_profile, sector_preference,ASSET_DATA):
-    """Recommends a mutual fund portfolio based on risk and sector preference."""
+def recommend_mf_portfolio(risk_profile, sector_preference,ASSET_DATA, rng=random):
+    """
+    Recommends a mutual fund portfolio based on risk and sector preference.
+    Funds are sampled with rng (e.g. a seeded random.Random to make the draw reproducible).
+    """
     recommended_mfs = []
 
     available_equity_mfs = [mf for mf in ASSET_DATA["mutual_funds"] if mf["type"] == "Equity"]
@@ -256,9 +400,9 @@ def recommend_mf_portfolio(risk_profile, sector_preference,ASSET_DATA):
 
         large_cap_mfs = [mf for mf in available_equity_mfs if mf["category"] == "Large Cap"]
 
-        recommended_mfs.extend(random.sample(equity_mfs_for_high_risk, min(6, len(equity_mfs_for_high_risk))))
+        recommended_mfs.extend(rng.sample(equity_mfs_for_high_risk, min(6, len(equity_mfs_for_high_risk))))
         remaining_large_caps_mf = [mf for mf in large_cap_mfs if mf not in recommended_mfs]
-        recommended_mfs.extend(random.sample(remaining_large_caps_mf, min(2, len(remaining_large_caps_mf))))
+        recommended_mfs.extend(rng.sample(remaining_large_caps_mf, min(2, len(remaining_large_caps_mf))))
 
 
     elif risk_profile == "Medium Risk ⚖️":
@@ -270,33 +414,72 @@ def recommend_mf_portfolio(risk_profile, sector_preference,ASSET_DATA):
         num_mid = min(2, len(mid_cap_mfs))
         num_flexi_large_mid = min(2, len(flexi_large_mid_mfs))
 
-        recommended_mfs.extend(random.sample(large_cap_mfs, num_large))
+        recommended_mfs.extend(rng.sample(large_cap_mfs, num_large))
         remaining_mid_mfs = [mf for mf in mid_cap_mfs if mf not in recommended_mfs]
-        recommended_mfs.extend(random.sample(remaining_mid_mfs, num_mid))
+        recommended_mfs.extend(rng.sample(remaining_mid_mfs, num_mid))
         remaining_flexi_large_mid_mfs = [mf for mf in flexi_large_mid_mfs if mf not in recommended_mfs]
-        recommended_mfs.extend(random.sample(remaining_flexi_large_mid_mfs, num_flexi_large_mid))
+        recommended_mfs.extend(rng.sample(remaining_flexi_large_mid_mfs, num_flexi_large_mid))
 
         if len(recommended_mfs) < 7:
             remaining_equity_mfs = [mf for mf in available_equity_mfs if mf not in recommended_mfs]
-            recommended_mfs.extend(random.sample(remaining_equity_mfs, min(7 - len(recommended_mfs), len(remaining_equity_mfs))))
+            recommended_mfs.extend(rng.sample(remaining_equity_mfs, min(7 - len(recommended_mfs), len(remaining_equity_mfs))))
 
     else: # Low Risk 🛡️
         large_cap_equity_mfs = [mf for mf in available_equity_mfs if mf["category"] == "Large Cap"]
 
-        recommended_mfs.extend(random.sample(large_cap_equity_mfs, min(5, len(large_cap_equity_mfs))))
+        recommended_mfs.extend(rng.sample(large_cap_equity_mfs, min(5, len(large_cap_equity_mfs))))
 
         remaining_debt_mfs = [mf for mf in available_debt_mfs if mf not in recommended_mfs]
-        recommended_mfs.extend(random.sample(remaining_debt_mfs, min(3, len(remaining_debt_mfs))))
+        recommended_mfs.extend(rng.sample(remaining_debt_mfs, min(3, len(remaining_debt_mfs))))
 
     final_portfolio = list({frozenset(item.items()): item for item in recommended_mfs}.values())
     final_portfolio.sort(key=lambda x: x["predicted_return"], reverse=True)
     return final_portfolio[:8]
 
-def recommend_multi_asset_portfolio_specific_funds(risk_profile, total_investment_amount, sector_preference, ASSET_DATA):
+def split_with_minimums(total_amount, weights, minimums):
+    """
+    Splits an amount by weights. While any share falls below its minimum, the smallest such
+    share is dropped (among equal shares the last one, as positions come ranked best first)
+    and its weight redistributed among the rest. Returns each position's share (0 if dropped).
+    """
+    kept = [i for i, w in enumerate(weights) if w > 0]
+    while kept and total_amount > 0:
+        total_weight = sum(weights[i] for i in kept)
+        amounts = {i: total_amount * weights[i] / total_weight for i in kept}
+        short = [i for i in kept if amounts[i] < minimums[i]]
+        if not short:
+            return [amounts.get(i, 0.0) for i in range(len(weights))]
+        kept.remove(min(short, key=lambda i: (amounts[i], -i)))
+    return [0.0] * len(weights)
+
+def allocate_mf_units(mf_portfolio, total_investment_amount, weights=None, min_investment=MF_MIN_INVESTMENT):
+    """
+    Allocates fractional mutual fund units from each fund's NAV ("price"), splitting the
+    total investment amount by target weights (evenly if no weights are given).
+    Funds whose share falls below their minimum investment amount are dropped and their
+    share is redistributed among the remaining funds.
+    """
+    if weights is None:
+        weights = [1.0] * len(mf_portfolio)
+
+    funds = [mf for mf, w in zip(mf_portfolio, weights) if w > 0 and mf["price"] > 0]
+    fund_weights = [w for mf, w in zip(mf_portfolio, weights) if w > 0 and mf["price"] > 0]
+    minimums = [mf.get("min_investment", min_investment) for mf in funds]
+    amounts = split_with_minimums(total_investment_amount, fund_weights, minimums)
+
+    # MF units are fractional; truncate to 3 decimals so the cost never exceeds the allotted amount
+    units = [math.floor(amount / mf["price"] * 1000) / 1000 for mf, amount in zip(funds, amounts)]
+    return [
+        {**mf, "units": u, "cost": round(u * mf["price"], 2)}
+        for mf, u, amount in zip(funds, units, amounts) if amount > 0
+    ]
+
+def recommend_multi_asset_portfolio_specific_funds(risk_profile, total_investment_amount, sector_preference, ASSET_DATA, rng=random):
     """
     Recommends specific assets for multi-asset allocation, including individual stocks for equity,
     debt ETFs/funds, and gold ETFs. Also calculates dynamic weightages and cost.
     Incorporates sector preference for equity stock selection and prioritizes by predicted return.
+    Weightages and asset counts are drawn with rng (e.g. a seeded random.Random).
     """
     equity_assets = []
     bond_assets = []
@@ -308,16 +491,16 @@ def recommend_multi_asset_portfolio_specific_funds(risk_profile, total_investmen
     gold_percentage = 0
 
     if risk_profile == "High Risk 🚀":
-        equity_percentage = random.uniform(0.60, 0.70) # 60-70%
-        bond_percentage = random.uniform(0.20, 0.30)  # 20-30%
+        equity_percentage = rng.uniform(0.60, 0.70) # 60-70%
+        bond_percentage = rng.uniform(0.20, 0.30)  # 20-30%
         gold_percentage = 1 - equity_percentage - bond_percentage # Remaining for gold
     elif risk_profile == "Medium Risk ⚖️":
-        equity_percentage = random.uniform(0.40, 0.50) # 40-50%
-        bond_percentage = random.uniform(0.30, 0.40)  # 30-40%
+        equity_percentage = rng.uniform(0.40, 0.50) # 40-50%
+        bond_percentage = rng.uniform(0.30, 0.40)  # 30-40%
         gold_percentage = 1 - equity_percentage - bond_percentage
     else: # Low Risk 🛡️
-        equity_percentage = random.uniform(0.20, 0.30) # 20-30%
-        bond_percentage = random.uniform(0.50, 0.60)  # 50-60%
+        equity_percentage = rng.uniform(0.20, 0.30) # 20-30%
+        bond_percentage = rng.uniform(0.50, 0.60)  # 50-60%
         gold_percentage = 1 - equity_percentage - bond_percentage
 
     # Normalize if rounding errors cause sum to not be 1
@@ -349,15 +532,15 @@ def recommend_multi_asset_portfolio_specific_funds(risk_profile, total_investmen
         available_stocks_for_selection = all_stocks
 
     # Sort the available stocks by predicted return (highest first)
-    available_stocks_for_selection.sort(key=lambda x: x["predicted_return"], reverse=True)
+    available_stocks_for_selection = sorted(available_stocks_for_selection, key=lambda x: x["predicted_return"], reverse=True)
 
     num_equity_assets_target = 0
     if risk_profile == "High Risk 🚀":
-        num_equity_assets_target = random.randint(3, 4)
+        num_equity_assets_target = rng.randint(3, 4)
     elif risk_profile == "Medium Risk ⚖️":
-        num_equity_assets_target = random.randint(2, 3) # Aim for 2-3 equity assets
+        num_equity_assets_target = rng.randint(2, 3) # Aim for 2-3 equity assets
     else: # Low Risk 🛡️
-        num_equity_assets_target = random.randint(1, 2)
+        num_equity_assets_target = rng.randint(1, 2)
 
     # Select the top N stocks based on predicted return from the *filtered* list
     selected_stocks_for_allocation = available_stocks_for_selection[:min(num_equity_assets_target, len(available_stocks_for_selection))]
@@ -381,11 +564,11 @@ def recommend_multi_asset_portfolio_specific_funds(risk_profile, total_investmen
     num_bond_assets_target = 0
 
     if risk_profile == "High Risk 🚀":
-        num_bond_assets_target = random.randint(2, 3)
+        num_bond_assets_target = rng.randint(2, 3)
     elif risk_profile == "Medium Risk ⚖️":
-        num_bond_assets_target = random.randint(3, 4) # Aim for 3-4 debt assets
+        num_bond_assets_target = rng.randint(3, 4) # Aim for 3-4 debt assets
     else: # Low Risk 🛡️
-        num_bond_assets_target = random.randint(4, 5)
+        num_bond_assets_target = rng.randint(4, 5)
 
     selected_bonds_for_allocation.extend(available_debt_etfs_index[:min(num_bond_assets_target, len(available_debt_etfs_index))])
 
@@ -542,8 +725,542 @@ def recommend_multi_asset_portfolio_specific_funds(risk_profile, total_investmen
     }
 
 
+
+def build_core_allocations(ASSET_DATA):
+    """
+    Precomputes the index core of a core-satellite portfolio for every risk profile: the best
+    index ETF/fund (by predicted return) in each eligible category, equally weighted.
+    The core only changes with the catalog, so this is built once per catalog version.
+    """
+    core_allocations = {}
+    for risk_profile, categories in CORE_CATEGORIES.items():
+        core = []
+        for category in categories:
+            candidates = [f for f in ASSET_DATA["equity_etfs_index_funds"] if f["category"] == category and f["price"] > 0]
+            if candidates:
+                core.append(max(candidates, key=lambda x: x["predicted_return"]))
+        core_allocations[risk_profile] = [(fund, 1 / len(core)) for fund in core]
+    return core_allocations
+
+def recommend_core_satellite_portfolio(risk_profile, sector_preference, total_investment_amount, ASSET_DATA, core_allocations=None, correlation=None, satellite_selection=None, rng=random):
+    """
+    Recommends a core-satellite portfolio: a low-cost index ETF/fund core sized by risk profile,
+    plus a satellite of stocks (High Risk) or mutual funds (Low/Medium Risk) picked by the
+    existing recommenders. Pass precomputed core_allocations so only the satellite is computed per request,
+    and a precomputed satellite_selection to only allocate units (rng draws a mutual fund satellite otherwise).
+    """
+    if core_allocations is None:
+        core_allocations = build_core_allocations(ASSET_DATA)
+
+    # Without any eligible index funds (e.g. in a restricted tenant catalog) everything goes to the satellite
+    core_amount = total_investment_amount * CORE_WEIGHTS[risk_profile] if core_allocations[risk_profile] else 0
+    satellite_amount = total_investment_amount - core_amount
+
+    # --- Core (Index ETFs / Index Funds) ---
+    core_assets = []
+    for fund, weight in core_allocations[risk_profile]:
+        amount = core_amount * weight
+        if fund.get("ticker"): # ETFs trade in whole units
+            units = int(amount / fund["price"])
+            asset_class_type = "Core (Index ETF)"
+        else: # Index fund units can be fractional
+            units = math.floor(amount / fund["price"] * 1000) / 1000
+            asset_class_type = "Core (Index Fund)"
+        if units > 0:
+            core_assets.append({**fund, "allocated_amount": round(units * fund["price"], 2), "units": units, "asset_class_type": asset_class_type})
+
+    # --- Satellite (Stocks / Mutual Funds) ---
+    if risk_profile == "High Risk 🚀":
+        if satellite_selection is None:
+            satellite_selection = select_equity_portfolio(risk_profile, sector_preference, ASSET_DATA, correlation)
+        satellite = allocate_equity_units(satellite_selection, satellite_amount)
+        asset_class_type = "Satellite (Stock)"
+    else:
+        if satellite_selection is None:
+            satellite_selection = recommend_mf_portfolio(risk_profile, sector_preference, ASSET_DATA, rng)
+        satellite = allocate_mf_units(satellite_selection, satellite_amount)
+        asset_class_type = "Satellite (Mutual Fund)"
+    satellite_assets = [{**a, "allocated_amount": a["cost"], "asset_class_type": asset_class_type} for a in satellite]
+
+    final_portfolio = core_assets + satellite_assets
+
+    actual_core_allocated = sum(a["allocated_amount"] for a in core_assets)
+    actual_satellite_allocated = sum(a["allocated_amount"] for a in satellite_assets)
+    total_actual_allocated = actual_core_allocated + actual_satellite_allocated
+
+    actual_core_percent = (actual_core_allocated / total_actual_allocated) * 100 if total_actual_allocated > 0 else 0
+    actual_satellite_percent = (actual_satellite_allocated / total_actual_allocated) * 100 if total_actual_allocated > 0 else 0
+
+    return {
+        "allocation_percentages": {
+            "Core": f"{actual_core_percent:.0f}%",
+            "Satellite": f"{actual_satellite_percent:.0f}%"
+        },
+        "recommended_assets": final_portfolio
+    }
+
+
+# --- Materialized Recommendation Tables ---
+
+def materialize_recommendations(ASSET_DATA, correlation=None, variants=MATERIALIZED_VARIANTS, seed=MATERIALIZATION_SEED):
+    """
+    Precomputes the amount-independent selections for every (risk profile, sector) pair:
+    equity stock picks and mutual fund picks (several random draws each), plus the
+    core-satellite index cores. Requests then only need a lookup and the unit allocation.
+    Sectors are keyed in lower case; None means no sector preference. The mutual fund
+    draws are seeded per key from seed, so they only depend on the catalog.
+    """
+    stock_sectors = sorted({s["sector"].lower() for s in ASSET_DATA["stocks"] if s.get("sector")})
+    mf_sectors = sorted({mf["sector"].lower() for mf in ASSET_DATA["mutual_funds"] if mf["type"] == "Equity" and mf.get("sector")})
+
+    table = {
+        "catalog": ASSET_DATA,
+        "catalog_version": catalog_version(ASSET_DATA),
+        "correlation": correlation,
+        "variants": variants,
+        "seed": seed,
+        "core_allocations": build_core_allocations(ASSET_DATA),
+        "Equity": {},
+        "Mutual Funds": {},
+    }
+    for risk_profile in RISK_PROFILES:
+        for sector in [None] + stock_sectors:
+            table["Equity"][(risk_profile, sector)] = select_equity_portfolio(risk_profile, sector, ASSET_DATA, correlation)
+        for sector in [None] + mf_sectors:
+            table["Mutual Funds"][(risk_profile, sector)] = draw_mf_selections(risk_profile, sector, ASSET_DATA, variants, seed)
+    index_selections(table)
+    return table
+
+def draw_mf_selections(risk_profile, sector, ASSET_DATA, variants, seed):
+    """Draws the mutual fund selections for one table key from a generator seeded by the key."""
+    rng = random.Random(f"{seed}:{risk_profile}:{sector}")
+    return [recommend_mf_portfolio(risk_profile, sector, ASSET_DATA, rng) for _ in range(variants)]
+
+def asset_id(asset):
+    """Identifies an asset across catalog versions (ticker, or name for funds without one)."""
+    return asset.get("ticker") or asset["name"]
+
+def index_selections(table):
+    """
+    Builds the table's reverse index from asset id to the (investment type, key) entries that
+    select it, and records the equity keys whose picks were topped up from all large caps.
+    """
+    asset_index = {}
+    equity_fill_keys = set()
+    for investment_type in ("Equity", "Mutual Funds"):
+        for key, selection in table[investment_type].items():
+            variants = selection if investment_type == "Mutual Funds" else [selection]
+            for variant in variants:
+                for asset in variant:
+                    asset_index.setdefault(asset_id(asset), set()).add((investment_type, key))
+    for (risk_profile, sector), selection in table["Equity"].items():
+        # Sector-specific picks outside High Risk are topped up from all large caps when the sector runs short
+        in_sector = sum(1 for s in selection if (s.get("sector") or "").lower() == sector)
+        if sector is not None and risk_profile != "High Risk 🚀" and in_sector < EQUITY_PORTFOLIO_SIZE:
+            equity_fill_keys.add((risk_profile, sector))
+    table["asset_index"] = asset_index
+    table["equity_fill_keys"] = equity_fill_keys
+
+def snapshot_catalog(ASSET_DATA):
+    """Captures a catalog (asset dict references and copies of their fields) for diffing against later."""
+    return {asset_class: (list(ASSET_DATA[asset_class]), [dict(a) for a in ASSET_DATA[asset_class]]) for asset_class in ASSET_DATA}
+
+def diff_catalogs(snapshot, new_snapshot):
+    """
+    Compares two catalog snapshots. Returns None if assets were added, removed or reordered,
+    otherwise a list of (asset_class, old_ref, old_asset, new_asset, changed_fields) for every
+    asset whose fields changed or whose dict was replaced (old_ref is the dict that was in the
+    catalog and old_asset a copy of its fields; new_asset is the dict now in the catalog).
+    Changed fields are taken from the snapshot copies, so edits made after new_snapshot was
+    taken show up in the next diff against it.
+    """
+    if set(snapshot) != set(new_snapshot):
+        return None
+    changes = []
+    for asset_class, (old_refs, old_assets) in snapshot.items():
+        new_refs, new_assets = new_snapshot[asset_class]
+        if len(old_assets) != len(new_assets) or any(asset_id(a) != asset_id(b) for a, b in zip(old_assets, new_assets)):
+            return None
+        for old_ref, old_asset, new_ref, new_asset in zip(old_refs, old_assets, new_refs, new_assets):
+            if old_ref is not new_ref or old_asset != new_asset:
+                changed_fields = {f for f in old_asset.keys() | new_asset.keys() if old_asset.get(f) != new_asset.get(f)}
+                changes.append((asset_class, old_ref, old_asset, new_ref, changed_fields))
+    return changes
+
+def candidate_keys(table, asset_class, asset, fill=True):
+    """
+    Returns the table entries whose candidate pool includes an asset with these fields
+    (with fill=False, leaving out equity entries that only reach it when topping up from all large caps).
+    """
+    keys = set()
+    sector = (asset.get("sector") or "").lower()
+    if asset_class == "stocks":
+        for risk_profile in RISK_PROFILES:
+            keys.add(("Equity", (risk_profile, None)))
+            if (risk_profile, sector) in table["Equity"]:
+                keys.add(("Equity", (risk_profile, sector)))
+        if fill and asset.get("market_cap") == "Large":
+            keys |= {("Equity", key) for key in table["equity_fill_keys"]}
+    elif asset_class == "mutual_funds":
+        if asset.get("type") == "Debt": # Debt funds are only picked for Low Risk
+            keys |= {("Mutual Funds", key) for key in table["Mutual Funds"] if key[0] == "Low Risk 🛡️"}
+        else:
+            for risk_profile in RISK_PROFILES:
+                keys.add(("Mutual Funds", (risk_profile, None)))
+                if (risk_profile, sector) in table["Mutual Funds"]:
+                    keys.add(("Mutual Funds", (risk_profile, sector)))
+    return keys
+
+def stale_asset_ids(snapshot, ASSET_DATA):
+    """
+    Returns the ids of assets in a catalog snapshot that were removed from the catalog, or whose
+    fields other than ALLOCATION_ONLY_FIELDS changed. Assets are matched by id (several funds can
+    share one), so this also works across added, removed or reordered assets.
+    """
+    def selection_fields(asset):
+        return {f: v for f, v in asset.items() if f not in ALLOCATION_ONLY_FIELDS}
+
+    current = {}
+    for asset_class in ASSET_DATA:
+        for asset in ASSET_DATA[asset_class]:
+            current.setdefault(asset_id(asset), []).append(selection_fields(asset))
+    return {
+        asset_id(old_asset)
+        for _, old_assets in snapshot.values() for old_asset in old_assets
+        if selection_fields(old_asset) not in current.get(asset_id(old_asset), [])
+    }
+
+def price_tie_breaks(stocks, changes):
+    """
+    Returns the ids of stocks whose price change can reorder them among stocks with the same
+    predicted return (select_equity_portfolio breaks those ties by price): those whose old to
+    new price range overlaps the price, or price range, of another stock with that return.
+    """
+    moved = {
+        asset_id(new_asset): (old_asset["price"], new_asset["price"])
+        for asset_class, _, old_asset, new_asset, changed_fields in changes
+        if asset_class == "stocks" and "price" in changed_fields
+    }
+    if not moved:
+        return set()
+    ranges_by_return = {}
+    for s in stocks:
+        prices = moved.get(asset_id(s), (s["price"], s["price"]))
+        ranges_by_return.setdefault(s["predicted_return"], []).append((asset_id(s), min(prices), max(prices)))
+    return {
+        aid
+        for ranges in ranges_by_return.values() if len(ranges) > 1
+        for aid, low, high in ranges
+        if aid in moved and any(other != aid and other_low <= high and low <= other_high for other, other_low, other_high in ranges)
+    }
+
+def update_recommendations(table, changes, correlation=None, catalog=None):
+    """
+    Incrementally updates a materialized table after in-place catalog changes (from diff_catalogs),
+    returning the new table (the old one is left untouched for in-flight requests) and stats.
+    Entries that select a changed asset, or whose candidate pool it enters or leaves, are
+    re-selected. Allocation-only changes (price, unless it reorders stocks with tied predicted
+    returns) skip re-selection: entries holding a replaced asset dict just have it swapped for the
+    current one, since units are allocated per request.
+    Pass catalog when the table's catalog object itself was rebuilt (e.g. a tenant view).
+    """
+    ASSET_DATA = catalog if catalog is not None else table["catalog"]
+    correlation = correlation if correlation is not None else table["correlation"]
+    table = {**table, "catalog": ASSET_DATA, "Equity": dict(table["Equity"]), "Mutual Funds": dict(table["Mutual Funds"]), "correlation": correlation}
+
+    # Sectors that appeared or disappeared add or drop their keys
+    current_sectors = {
+        "Equity": {s["sector"].lower() for s in ASSET_DATA["stocks"] if s.get("sector")},
+        "Mutual Funds": {mf["sector"].lower() for mf in ASSET_DATA["mutual_funds"] if mf["type"] == "Equity" and mf.get("sector")},
+    }
+    reselect = set()
+    vanished = set()
+    for investment_type, sectors in current_sectors.items():
+        vanished |= {(investment_type, k) for k in table[investment_type] if k[1] is not None and k[1] not in sectors}
+        existing = {k[1] for k in table[investment_type]}
+        reselect |= {(investment_type, (risk_profile, sector)) for sector in sectors - existing for risk_profile in RISK_PROFILES}
+
+    # The table may be for a tenant view, so only assets inside the view (or already selected) matter
+    in_view = {asset_class: {asset_id(a) for a in ASSET_DATA[asset_class]} for asset_class in ("stocks", "mutual_funds", "equity_etfs_index_funds")}
+    tie_breaks = price_tie_breaks(ASSET_DATA["stocks"], changes)
+    rebind = set()
+    replaced = {}
+    rebuild_core = False
+    for asset_class, old_ref, old_asset, new_asset, changed_fields in changes:
+        aid = asset_id(new_asset)
+        selected_in = table["asset_index"].get(aid, set())
+        if aid not in in_view.get(asset_class, ()) and not selected_in:
+            continue
+        if asset_class == "equity_etfs_index_funds":
+            rebuild_core = True
+        elif changed_fields <= ALLOCATION_ONLY_FIELDS:
+            # Edited in place: selections already see the new price. Replaced: swap in the new dict
+            if old_ref is not new_asset:
+                replaced[id(old_ref)] = new_asset
+                rebind |= selected_in
+            # The top-up from all large caps goes by predicted return alone, so only the price-sorted pools can reorder
+            if aid in tie_breaks:
+                reselect |= candidate_keys(table, asset_class, new_asset, fill=False)
+        else:
+            reselect |= selected_in | candidate_keys(table, asset_class, old_asset) | candidate_keys(table, asset_class, new_asset)
+
+    for investment_type, key in vanished:
+        del table[investment_type][key]
+    reselect -= vanished
+    rebind -= vanished
+
+    for investment_type, key in rebind - reselect:
+        selection = table[investment_type][key]
+        if investment_type == "Mutual Funds":
+            table[investment_type][key] = [[replaced.get(id(a), a) for a in variant] for variant in selection]
+        else:
+            table[investment_type][key] = [replaced.get(id(a), a) for a in selection]
+
+    for investment_type, (risk_profile, sector) in reselect:
+        if investment_type == "Equity":
+            table["Equity"][(risk_profile, sector)] = select_equity_portfolio(risk_profile, sector, ASSET_DATA, correlation)
+        else:
+            table["Mutual Funds"][(risk_profile, sector)] = draw_mf_selections(risk_profile, sector, ASSET_DATA, table["variants"], table["seed"])
+
+    if rebuild_core:
+        table["core_allocations"] = build_core_allocations(ASSET_DATA)
+    if reselect or rebind or vanished:
+        index_selections(table)
+    table["catalog_version"] = catalog_version(ASSET_DATA)
+
+    return table, {
+        "entries": len(table["Equity"]) + len(table["Mutual Funds"]),
+        "reselected": len(reselect),
+        "rebound": len(rebind - reselect),
+    }
+
+def lookup_selection(table, investment_type, risk_profile, sector_preference, rng=random):
+    """Returns the materialized selection for a request (a variant drawn with rng for mutual funds)."""
+    selections = table[investment_type]
+    key = (risk_profile, sector_preference.lower() if sector_preference else None)
+    if key not in selections: # Unknown sectors fall back to all sectors, as in the live recommenders
+        key = (risk_profile, None)
+    selection = selections[key]
+    return rng.choice(selection) if investment_type == "Mutual Funds" else selection
+
+def selection_keys(risk_profile, investment_type, sector_preference):
+    """
+    Returns the table selections a recommendation is served from, as (selection, risk profile, sector)
+    keys comparable with changed_selections. Requests for an unknown sector depend on both their own
+    key (the sector may appear later) and the all-sectors fallback. Multi Asset Allocation is picked
+    live, so it depends on no selection.
+    """
+    sector = sector_preference.lower() if sector_preference else None
+    sectors = [sector, None] if sector is not None else [None]
+    if investment_type in ("Equity", "Mutual Funds"):
+        return [(investment_type, risk_profile, s) for s in sectors]
+    if investment_type == "Core Satellite":
+        satellite_type = "Equity" if risk_profile == "High Risk 🚀" else "Mutual Funds"
+        return [("Core", risk_profile, None)] + [(satellite_type, risk_profile, s) for s in sectors]
+    return []
+
+def changed_selections(old_table, new_table):
+    """
+    Returns the (selection, risk profile, sector) keys whose selected assets differ between two
+    tables, including keys only one of them has and core-satellite cores ("Core", risk profile, None).
+    """
+    def asset_ids(investment_type, selection):
+        if investment_type == "Mutual Funds":
+            return [[asset_id(a) for a in variant] for variant in selection]
+        return [asset_id(a) for a in selection]
+
+    changed = set()
+    for investment_type in ("Equity", "Mutual Funds"):
+        old, new = old_table[investment_type], new_table[investment_type]
+        for key in old.keys() | new.keys():
+            if key not in old or key not in new or asset_ids(investment_type, old[key]) != asset_ids(investment_type, new[key]):
+                changed.add((investment_type, *key))
+    for risk_profile in RISK_PROFILES:
+        old_core = [(asset_id(f), w) for f, w in old_table["core_allocations"][risk_profile]]
+        new_core = [(asset_id(f), w) for f, w in new_table["core_allocations"][risk_profile]]
+        if old_core != new_core:
+            changed.add(("Core", risk_profile, None))
+    return changed
+
+def recommend_from_table(table, risk_profile, investment_type, sector_preference, total_investment_amount, rng=random):
+    """
+    Serves a recommendation from a materialized table: a selection lookup plus the
+    amount-dependent unit allocation. Multi Asset Allocation picks and weights depend on
+    the amount, so that investment type is still computed live against the table's catalog.
+    Every random draw goes through rng, so with a seeded random.Random the result is
+    reproducible from the seed and a table built from the same catalog.
+    """
+    if investment_type == "Equity":
+        return allocate_equity_units(lookup_selection(table, "Equity", risk_profile, sector_preference), total_investment_amount)
+    elif investment_type == "Mutual Funds":
+        return allocate_mf_units(lookup_selection(table, "Mutual Funds", risk_profile, sector_preference, rng), total_investment_amount)
+    elif investment_type == "Core Satellite":
+        satellite_type = "Equity" if risk_profile == "High Risk 🚀" else "Mutual Funds"
+        return recommend_core_satellite_portfolio(
+            risk_profile, sector_preference, total_investment_amount, table["catalog"],
+            core_allocations=table["core_allocations"],
+            satellite_selection=lookup_selection(table, satellite_type, risk_profile, sector_preference, rng)
+        )
+    else:
+        return recommend_multi_asset_portfolio_specific_funds(risk_profile, total_investment_amount, sector_preference, table["catalog"], rng)
+
+
+# --- What-if Sensitivity Sweeps ---
+
+# Largest grid a single sweep may expand to
+MAX_SWEEP_POINTS = 10000
+
+def sweep_range_length(spec):
+    """Returns how many values a sweep axis expands to, without expanding it."""
+    if isinstance(spec, dict):
+        if "start" not in spec or "stop" not in spec:
+            raise ValueError("Sweep ranges need a start and a stop.")
+        start, stop, step = spec["start"], spec["stop"], spec.get("step", 1)
+        if not all(math.isfinite(v) for v in (start, stop, step)):
+            raise ValueError("Sweep start, stop and step must be finite numbers.")
+        if step <= 0:
+            raise ValueError("Sweep step must be positive.")
+        span = (stop - start) / step
+        if not math.isfinite(span):
+            raise ValueError("Sweep range is too large.")
+        return max(int(math.floor(span + 1e-9)) + 1, 0)
+    return len(spec) if isinstance(spec, (list, tuple)) else 1
+
+def expand_sweep_range(spec):
+    """Expands a sweep axis given as a list of values or as {"start", "stop", "step"} (stop inclusive)."""
+    if isinstance(spec, dict):
+        start, step = spec["start"], spec.get("step", 1)
+        return [round(start + i * step, 10) for i in range(sweep_range_length(spec))]
+    return list(spec) if isinstance(spec, (list, tuple)) else [spec]
+
+def sweep_recommendations(base_profile, ranges, table, rng=random):
+    """
+    Evaluates a what-if grid: every combination of the swept profile fields (e.g.
+    total_investment_amount, age, drawdown), with the other fields taken from base_profile.
+    Risk points are computed once per distinct value on each axis and summed per grid point,
+    and each distinct (risk profile, investment type, sector, amount) is recommended only once;
+    grid points refer to their recommendation by its index in "portfolios".
+    Random draws are made once per (risk profile, investment type, sector) from rng and replayed
+    for every amount, so along an amount axis only the allocation changes, and with a seeded
+    random.Random the whole sweep is reproducible from the seed.
+    """
+    # Size the grid from the range bounds before expanding any axis
+    num_points = math.prod(sweep_range_length(spec) for spec in ranges.values())
+    if num_points > MAX_SWEEP_POINTS:
+        raise ValueError(f"Sweep has {num_points} points; the maximum is {MAX_SWEEP_POINTS}.")
+
+    axes = {field: expand_sweep_range(spec) for field, spec in ranges.items()}
+    # Ordered (not a set union) so every worker enumerates the grid in the same order
+    fields = list(dict.fromkeys([*base_profile, *axes]))
+    values = [axes.get(field, [base_profile.get(field)]) for field in fields]
+
+    # Risk points per axis value, so each grid point's score is just a sum of lookups
+    axis_scores = [
+        [RISK_SCORE_RULES[field](v) for v in axis] if field in RISK_SCORE_RULES else [0] * len(axis)
+        for field, axis in zip(fields, values)
+    ]
+
+    selection_seeds = {}
+    portfolio_ids = {}
+    portfolios = []
+    points = []
+    for combination, scores in zip(product(*values), product(*axis_scores)):
+        profile = dict(zip(fields, combination))
+        risk_score = sum(scores)
+        risk_profile = categorize_risk_profile(risk_score)
+        sector_preference = profile.get("sector_preference") or None
+        selection = (risk_profile, profile["investment_type"], sector_preference.lower() if sector_preference else None)
+        key = (*selection, profile["total_investment_amount"])
+        if key not in portfolio_ids:
+            if selection not in selection_seeds:
+                selection_seeds[selection] = rng.randrange(2**32)
+            portfolio_ids[key] = len(portfolios)
+            portfolios.append(recommend_from_table(
+                table, risk_profile, profile["investment_type"], sector_preference, profile["total_investment_amount"],
+                rng=random.Random(selection_seeds[selection])
+            ))
+        points.append({
+            "inputs": {field: profile[field] for field in axes},
+            "risk_score": risk_score,
+            "risk_profile": risk_profile,
+            "portfolio_id": portfolio_ids[key],
+        })
+
+    return {"points": points, "portfolios": portfolios}
+
+# --- SIP (Recurring Investment) Planning ---
+
+def plan_sip(portfolio, monthly_amount, years, step_up_rate=0.0, min_investment=MF_MIN_INVESTMENT):
+    """
+    Projects a monthly SIP (with an optional annual step-up) onto a portfolio returned by any
+    recommend_* function. The monthly contribution is split across assets in proportion to their
+    cost in the portfolio, dropping funds (assets without a ticker) whose SIP would fall below
+    their minimum investment amount, as in allocate_mf_units. Each asset's price (NAV) is assumed
+    to grow at its predicted return.
+    Returns the year-by-year schedule, per-asset unit accumulation and the projected corpus.
+    """
+    assets = portfolio["recommended_assets"] if isinstance(portfolio, dict) else portfolio
+    assets = [a for a in assets if a.get("price", 0) > 0]
+    num_months = int(years * 12)
+    if not assets or num_months <= 0 or monthly_amount <= 0:
+        return {"schedule": [], "assets": [], "total_invested": 0, "projected_corpus": 0}
+
+    # Weight each asset by its lump-sum cost, falling back to an even split
+    costs = [a.get("cost", a.get("allocated_amount", 0)) for a in assets]
+    total_cost = sum(costs)
+    weights = [c / total_cost for c in costs] if total_cost > 0 else [1 / len(assets)] * len(assets)
+    # Stocks and ETFs are bought in whole units on an exchange; only funds have a minimum SIP
+    minimums = [0 if a.get("ticker") else a.get("min_investment", min_investment) for a in assets]
+    amounts = split_with_minimums(monthly_amount, weights, minimums)
+    funded = [(asset, amount / monthly_amount) for asset, amount in zip(assets, amounts) if amount > 0]
+    if not funded:
+        return {"schedule": [], "assets": [], "total_invested": 0, "projected_corpus": 0}
+
+    # The monthly amount steps up at the start of each year (the last year may be partial)
+    num_years = math.ceil(num_months / 12)
+    year_months = [min(12, num_months - 12 * y) for y in range(num_years)]
+    year_amounts = [monthly_amount * (1 + step_up_rate) ** y for y in range(num_years)]
+    invested = list(accumulate(a * n for a, n in zip(year_amounts, year_months)))
+    year_ends = [m - 1 for m in accumulate(year_months)]  # index of each year's last month
+
+    # Closed form per asset: with the NAV at price * g**m, the units held after month m are
+    # weight / price * sum(c_k / g**k for k <= m), worth weight * g**m * that same sum. Within a
+    # year c_k is constant, so each year adds c_y * g**-first * (1 + g**-1 + ... + g**-(n - 1))
+    yearly_values = [0.0] * num_years
+    asset_plans = []
+    for asset, weight in funded:
+        g = (1 + asset.get("predicted_return", 0)) ** (1 / 12)
+        discount = 1 / g
+        discounted = list(accumulate(
+            a * discount ** (12 * y) * ((1 - discount ** n) / (1 - discount) if discount != 1 else n)
+            for y, (a, n) in enumerate(zip(year_amounts, year_months))
+        ))
+        yearly_values = [v + weight * g ** end * d for v, end, d in zip(yearly_values, year_ends, discounted)]
+        units = weight / asset["price"] * discounted[-1]
+        asset_plans.append({
+            "name": asset["name"],
+            "weight": weight,
+            "monthly_amount": monthly_amount * weight,
+            "units": round(units, 3),
+            "projected_value": round(units * asset["price"] * g ** year_ends[-1], 2),
+        })
+
+    schedule = [
+        {"year": y + 1, "month": end + 1, "contribution": round(a, 2), "invested": round(i, 2), "value": round(v, 2)}
+        for y, (end, a, i, v) in enumerate(zip(year_ends, year_amounts, invested, yearly_values))
+    ]
+
+    return {
+        "schedule": schedule,
+        "assets": asset_plans,
+        "total_invested": round(invested[-1], 2),
+        "projected_corpus": round(yearly_values[-1], 2),
+    }
+
 # --- Main Execution Flow ---
 if __name__ == "__main__":
+    from asset_data import ASSET_DATA
+
     user_profile = get_user_input()
     calculated_risk_score = calculate_risk_score(user_profile)
     risk_profile = categorize_risk_profile(calculated_risk_score)
@@ -556,7 +1273,7 @@ if __name__ == "__main__":
     print("\n--- Portfolio Recommendation ---")
     if user_profile["investment_type"].lower() == "equity":
         # Pass total_investment_amount to the equity recommendation function
-        portfolio = recommend_equity_portfolio(risk_profile, user_profile["sector_preference"], user_profile["total_investment_amount"])
+        portfolio = recommend_equity_portfolio(risk_profile, user_profile["sector_preference"], user_profile["total_investment_amount"], ASSET_DATA, correlation=build_correlation_matrix(ASSET_DATA["stocks"]))
         if portfolio:
             print(f"Recommended Equity Portfolio for {risk_profile}:")
             total_equity_cost = 0
@@ -572,25 +1289,40 @@ if __name__ == "__main__":
             print("Could not generate a suitable equity portfolio based on your preferences or budget for individual stocks.")
 
     elif user_profile["investment_type"].lower() == "mutual funds":
-        portfolio = recommend_mf_portfolio(risk_profile, user_profile["sector_preference"])
+        portfolio = allocate_mf_units(
+            recommend_mf_portfolio(risk_profile, user_profile["sector_preference"], ASSET_DATA),
+            user_profile["total_investment_amount"]
+        )
         if portfolio:
             print(f"Recommended Mutual Fund Portfolio for {risk_profile}:")
-            # For mutual funds, still distribute evenly and allow fractional units
-            amount_per_mf = user_profile["total_investment_amount"] / len(portfolio) if len(portfolio) > 0 else 0
+            # Units (fractional) and cost are calculated by allocate_mf_units
             total_mf_cost = 0
             for i, asset in enumerate(portfolio):
-                units = round(amount_per_mf / asset["price"], 3) if asset["price"] > 0 else 0 # MF units can be fractional
-                cost = units * asset["price"]
-                total_mf_cost += cost
-                # Ensure at least a small amount is allocated for display if price > 0
-                if units * asset["price"] > 0.01: # Check if cost is meaningful
-                    print(f"{i+1}. {asset['name']} (Type: {asset['type']}, Category: {asset['category']}), Predicted Return: {asset['predicted_return']:.2%}, Units: {units}, Cost: ₹{cost:,.2f}")
+                total_mf_cost += asset["cost"]
+                print(f"{i+1}. {asset['name']} (Type: {asset['type']}, Category: {asset['category']}), Predicted Return: {asset['predicted_return']:.2%}, Units: {asset['units']}, Cost: ₹{asset['cost']:,.2f}")
             print(f"\nTotal Allocated Mutual Fund Cost: ₹{total_mf_cost:,.2f} (from ₹{user_profile['total_investment_amount']:,.2f} target)")
         else:
             print("Could not generate a suitable mutual fund portfolio based on your preferences.")
 
+    elif user_profile["investment_type"].lower() == "core satellite":
+        allocation_result = recommend_core_satellite_portfolio(risk_profile, user_profile["sector_preference"], user_profile["total_investment_amount"], ASSET_DATA, correlation=build_correlation_matrix(ASSET_DATA["stocks"]))
+
+        print(f"Recommended Core-Satellite Allocation for {risk_profile}:")
+        for sleeve, weightage in allocation_result["allocation_percentages"].items():
+            print(f"- {sleeve}: {weightage}")
+
+        specific_assets = allocation_result["recommended_assets"]
+        if specific_assets:
+            print(f"\nSpecific Recommended Assets ({len(specific_assets)} assets):")
+            for i, asset in enumerate(specific_assets):
+                ticker_display = f" ({asset.get('ticker')})" if asset.get('ticker') else ""
+                print(f"{i+1}. {asset['name']}{ticker_display} ({asset['asset_class_type']}), Pred. Return: {asset.get('predicted_return', 0):.2%}, Units: {asset['units']}, Cost: ₹{asset['allocated_amount']:,.2f}")
+            print(f"Total Portfolio Cost: ₹{sum(a['allocated_amount'] for a in specific_assets):,.2f} (from ₹{user_profile['total_investment_amount']:,.2f} target)")
+        else:
+            print("Could not generate a suitable core-satellite portfolio based on your preferences or budget.")
+
     else: # Multi Asset Allocation
-        allocation_result = recommend_multi_asset_portfolio_specific_funds(risk_profile, user_profile["total_investment_amount"], user_profile["sector_preference"])
+        allocation_result = recommend_multi_asset_portfolio_specific_funds(risk_profile, user_profile["total_investment_amount"], user_profile["sector_preference"], ASSET_DATA)
 
         print(f"Recommended Asset Allocation for {risk_profile}:")
         for asset_class, weightage in allocation_result["allocation_percentages"].items():
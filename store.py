@@ -0,0 +1,265 @@
+import atexit
+import json
+import queue
+import sqlite3
+import threading
+import time
+import uuid
+
+from logic import asset_id
+
+# Default location of the recommendation database (overridable with the PORTFOLIO_DB_PATH env variable in app.py)
+DEFAULT_DB_PATH = "recommendations.db"
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS recommendations (
+    plan_id TEXT PRIMARY KEY,
+    client_id TEXT,
+    created_at REAL NOT NULL,
+    catalog_version TEXT NOT NULL,
+    seed INTEGER,
+    risk_score INTEGER,
+    risk_profile TEXT,
+    user_profile TEXT NOT NULL,
+    portfolio TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_recommendations_client_id ON recommendations (client_id, created_at);
+CREATE INDEX IF NOT EXISTS idx_recommendations_created_at ON recommendations (created_at);
+CREATE TABLE IF NOT EXISTS plan_assets (
+    asset_id TEXT NOT NULL,
+    plan_id TEXT NOT NULL,
+    PRIMARY KEY (asset_id, plan_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS plan_selections (
+    selection_key TEXT NOT NULL,
+    plan_id TEXT NOT NULL,
+    PRIMARY KEY (selection_key, plan_id)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS plan_invalidations (
+    plan_id TEXT PRIMARY KEY,
+    invalidated_at REAL NOT NULL,
+    catalog_version TEXT
+);
+"""
+
+COLUMNS = ("plan_id", "client_id", "created_at", "catalog_version", "seed",
+           "risk_score", "risk_profile", "user_profile", "portfolio")
+
+# Stored plans with their invalidation time (NULL unless a catalog change invalidated them)
+SELECT_PLANS = (
+    f"SELECT {', '.join('r.' + c for c in COLUMNS)}, i.invalidated_at FROM recommendations r "
+    "LEFT JOIN plan_invalidations i ON i.plan_id = r.plan_id"
+)
+
+
+class RecommendationStore:
+    """
+    Persists every recommendation (profile, catalog version, seed and resulting portfolio) to a
+    local SQLite database in WAL mode. Writes are queued and committed in batches by a background
+    writer thread so the request path only pays for an in-memory enqueue. Reverse indexes from
+    asset id and from selection key (the materialized selections a plan was served from) to plan
+    let catalog changes invalidate just the plans holding a changed asset or served from a
+    selection that changed.
+    """
+
+    def __init__(self, db_path=DEFAULT_DB_PATH, batch_size=100, flush_interval=0.5):
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        conn = self._connect()
+        conn.executescript(SCHEMA)
+        conn.close()
+
+        # Plans that have been queued but not yet committed, so reads never miss a fresh plan
+        self._pending = {}
+        self._pending_lock = threading.Lock()
+        self._queue = queue.Queue()
+        self._local = threading.local()
+        self._writer = threading.Thread(target=self._write_loop, name="recommendation-store-writer", daemon=True)
+        self._writer.start()
+        atexit.register(self.close)
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _reader(self):
+        """Returns this thread's read connection (SQLite connections are not shared across threads)."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._local.conn = self._connect()
+        return conn
+
+    def save(self, user_profile, risk_score, risk_profile, portfolio, catalog_version, seed=None, client_id=None, selection_keys=()):
+        """
+        Queues a recommendation for persistence and returns its plan id immediately.
+        selection_keys (any JSON-serializable values) identify the selections the plan was served from.
+        """
+        plan_id = uuid.uuid4().hex
+        record = {
+            "plan_id": plan_id,
+            "client_id": client_id,
+            "created_at": time.time(),
+            "catalog_version": catalog_version,
+            "seed": seed,
+            "risk_score": risk_score,
+            "risk_profile": risk_profile,
+            "user_profile": user_profile,
+            "portfolio": portfolio,
+            "selection_keys": list(selection_keys),
+            "invalidated_at": None,
+        }
+        with self._pending_lock:
+            self._pending[plan_id] = record
+        self._queue.put(record)
+        return plan_id
+
+    def get(self, plan_id):
+        """Returns a stored recommendation by plan id (or None), without recomputing it."""
+        with self._pending_lock:
+            record = self._pending.get(plan_id)
+        if record is not None:
+            return {c: record[c] for c in COLUMNS + ("invalidated_at",)}
+        row = self._reader().execute(f"{SELECT_PLANS} WHERE r.plan_id = ?", (plan_id,)).fetchone()
+        return self._from_row(row) if row is not None else None
+
+    def list_for_client(self, client_id, limit=20):
+        """Returns the most recent recommendations made for a client, newest first."""
+        self.flush()
+        rows = self._reader().execute(
+            f"{SELECT_PLANS} WHERE r.client_id = ? ORDER BY r.created_at DESC LIMIT ?", (client_id, limit)
+        ).fetchall()
+        return [self._from_row(row) for row in rows]
+
+    def recent_profiles(self, limit=10000):
+        """Returns the user profiles of the most recent recommendations (e.g. to replay realistic traffic)."""
+        self.flush()
+        rows = self._reader().execute(
+            "SELECT user_profile FROM recommendations ORDER BY created_at DESC LIMIT ?", (limit,)
+        ).fetchall()
+        return [json.loads(row[0]) for row in rows]
+
+    def invalidate_assets(self, asset_ids, catalog_version=None):
+        """
+        Marks every stored plan holding any of the given assets as invalidated (the assets changed
+        or were removed) and returns how many plans were newly marked.
+        """
+        return self._invalidate("plan_assets", "asset_id", asset_ids, catalog_version)
+
+    def invalidate_selections(self, selection_keys, catalog_version=None):
+        """
+        Marks every stored plan served from any of the given selections as invalidated (they would
+        now select different assets) and returns how many plans were newly marked.
+        """
+        return self._invalidate("plan_selections", "selection_key", [self._selection_key(k) for k in selection_keys], catalog_version)
+
+    def _invalidate(self, index_table, column, ids, catalog_version):
+        self.flush()
+        ids = list(ids)
+        if not ids:
+            return 0
+        conn = self._connect()
+        try:
+            with conn:
+                conn.execute("CREATE TEMP TABLE changed (id TEXT PRIMARY KEY)")
+                conn.executemany("INSERT OR IGNORE INTO changed VALUES (?)", [(i,) for i in ids])
+                cursor = conn.execute(
+                    "INSERT OR IGNORE INTO plan_invalidations (plan_id, invalidated_at, catalog_version) "
+                    f"SELECT DISTINCT plan_id, ?, ? FROM {index_table} WHERE {column} IN (SELECT id FROM changed)",
+                    (time.time(), catalog_version)
+                )
+                return cursor.rowcount
+        finally:
+            conn.close()
+
+    def flush(self):
+        """Blocks until every queued recommendation has been committed."""
+        self._queue.join()
+
+    def close(self):
+        """Flushes pending writes and stops the writer thread."""
+        if self._writer.is_alive():
+            self._queue.put(None)
+            self._writer.join()
+
+    def _write_loop(self):
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            # Drain whatever else is already queued (up to batch_size) into the same transaction
+            deadline = time.monotonic() + self.flush_interval
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get(timeout=max(0, deadline - time.monotonic())))
+                except queue.Empty:
+                    break
+                if batch[-1] is None:
+                    break
+            stopping = batch[-1] is None
+            records = [r for r in batch if r is not None]
+            try:
+                self._write_batch(conn, records)
+            except Exception as e: # Keep the writer alive; otherwise every later flush() would block forever
+                print(f"Warning: Could not persist {len(records)} recommendation(s): {e}")
+            finally:
+                # Always release flush() waiters, even if this batch could not be written
+                with self._pending_lock:
+                    for r in records:
+                        self._pending.pop(r["plan_id"], None)
+                for _ in batch:
+                    self._queue.task_done()
+        conn.close()
+
+    def _write_batch(self, conn, records):
+        rows = []
+        asset_rows = []
+        selection_rows = []
+        for r in records:
+            # A record that can't be serialized is dropped on its own instead of failing the batch
+            try:
+                row = self._to_row(r)
+                asset_ids = self._asset_ids(r["portfolio"])
+                selection_keys = {self._selection_key(k) for k in r.get("selection_keys", ())}
+            except (TypeError, ValueError, KeyError) as e:
+                print(f"Warning: Could not serialize recommendation {r['plan_id']}: {e}")
+                continue
+            rows.append(row)
+            asset_rows.extend((aid, r["plan_id"]) for aid in asset_ids)
+            selection_rows.extend((key, r["plan_id"]) for key in selection_keys)
+        if not rows:
+            return
+        with conn:
+            conn.executemany(
+                f"INSERT OR REPLACE INTO recommendations ({', '.join(COLUMNS)}) "
+                f"VALUES ({', '.join('?' * len(COLUMNS))})",
+                rows
+            )
+            conn.executemany("INSERT OR IGNORE INTO plan_assets (asset_id, plan_id) VALUES (?, ?)", asset_rows)
+            conn.executemany("INSERT OR IGNORE INTO plan_selections (selection_key, plan_id) VALUES (?, ?)", selection_rows)
+
+    @staticmethod
+    def _asset_ids(portfolio):
+        assets = portfolio["recommended_assets"] if isinstance(portfolio, dict) else portfolio
+        return {asset_id(a) for a in assets}
+
+    @staticmethod
+    def _selection_key(key):
+        return json.dumps(key, ensure_ascii=False)
+
+    @staticmethod
+    def _to_row(record):
+        return tuple(
+            json.dumps(record[c], ensure_ascii=False) if c in ("user_profile", "portfolio") else record[c]
+            for c in COLUMNS
+        )
+
+    @staticmethod
+    def _from_row(row):
+        record = dict(zip(COLUMNS + ("invalidated_at",), row))
+        record["user_profile"] = json.loads(record["user_profile"])
+        record["portfolio"] = json.loads(record["portfolio"])
+        return record
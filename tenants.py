@@ -0,0 +1,71 @@
+import json
+from collections.abc import Mapping
+from itertools import compress
+
+
+def build_mask(assets, rules):
+    """
+    Returns a bitmask (bit i set => assets[i] allowed) for assets matching every rule.
+    Rules map an asset field to its allowed values, e.g. {"amc": ["SBI", "HDFC"]}.
+    """
+    allowed = {field: {str(v).lower() for v in values} for field, values in rules.items()}
+    mask = 0
+    for i, asset in enumerate(assets):
+        if all(str(asset.get(field, "")).lower() in values for field, values in allowed.items()):
+            mask |= 1 << i
+    return mask
+
+
+class CatalogView(Mapping):
+    """
+    A tenant-scoped, read-only view of the shared asset catalog. Each asset class is selected from
+    the base catalog with a bitmask instead of being copied, so a view costs one integer per
+    restricted asset class. Behaves like ASSET_DATA, so it can be passed to any recommend_* function.
+    """
+
+    __slots__ = ("base", "masks", "tenant")
+
+    def __init__(self, base, masks, tenant=None):
+        self.base = base
+        self.masks = masks  # asset class -> bitmask; asset classes without a mask are unrestricted
+        self.tenant = tenant
+
+    def __getitem__(self, asset_class):
+        assets = self.base[asset_class]
+        mask = self.masks.get(asset_class)
+        if mask is None:
+            return assets
+        # bin() gives the most significant bit first; reverse it so position i lines up with assets[i]
+        bits = bin(mask)[:1:-1]
+        return list(compress(assets, (b == "1" for b in bits)))
+
+    def __iter__(self):
+        return iter(self.base)
+
+    def __len__(self):
+        return len(self.base)
+
+    def __repr__(self):
+        return f"CatalogView(tenant={self.tenant!r}, restricted={sorted(self.masks)})"
+
+
+def build_tenant_catalogs(ASSET_DATA, tenant_rules):
+    """
+    Builds a CatalogView per tenant from rules of the form
+    {tenant: {asset_class: {field: [allowed values]}}}, e.g.
+    {"distributor_a": {"mutual_funds": {"amc": ["SBI", "HDFC"]}, "stocks": {"ticker": ["TCS.NS"]}}}.
+    """
+    return {
+        tenant: CatalogView(
+            ASSET_DATA,
+            {asset_class: build_mask(ASSET_DATA[asset_class], rules) for asset_class, rules in asset_class_rules.items()},
+            tenant
+        )
+        for tenant, asset_class_rules in tenant_rules.items()
+    }
+
+
+def load_tenant_rules(path):
+    """Loads tenant rules ({tenant: {asset_class: {field: [allowed values]}}}) from a JSON file."""
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
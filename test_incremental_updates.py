@@ -0,0 +1,94 @@
+"""
+Checks that incrementally updated recommendation tables match a full rebuild from the same catalog.
+
+Usage: python -m pytest test_incremental_updates.py
+"""
+import copy
+import random
+
+from asset_data import ASSET_DATA
+from logic import (CORRELATION_FIELDS, asset_id, build_correlation_matrix,
+                   diff_catalogs, materialize_recommendations,
+                   snapshot_catalog, update_recommendations)
+
+
+def selections(table):
+    """The table's selections as asset ids, so tables built from different dicts can be compared."""
+    return {
+        "Equity": {key: [asset_id(a) for a in selection] for key, selection in table["Equity"].items()},
+        "Mutual Funds": {key: [[asset_id(a) for a in variant] for variant in selection] for key, selection in table["Mutual Funds"].items()},
+        "Core": {risk_profile: [(asset_id(f), w) for f, w in core] for risk_profile, core in table["core_allocations"].items()},
+    }
+
+
+def apply_update(catalog, table, snapshot):
+    changes = diff_catalogs(snapshot, snapshot_catalog(catalog))
+    assert changes is not None
+    changed_fields = set().union(*(fields for asset_class, _, _, _, fields in changes if asset_class == "stocks"))
+    correlation = build_correlation_matrix(catalog["stocks"]) if changed_fields & CORRELATION_FIELDS else table["correlation"]
+    updated, _ = update_recommendations(table, changes, correlation)
+    return updated, materialize_recommendations(catalog, correlation)
+
+
+def test_stock_price_moves_match_rebuild():
+    # Prices break ties between stocks with equal predicted returns, so splits can change the picks
+    catalog = copy.deepcopy(ASSET_DATA)
+    table = materialize_recommendations(catalog, build_correlation_matrix(catalog["stocks"]))
+    for stock in catalog["stocks"]:
+        for factor in (0.1, 10):
+            snapshot = snapshot_catalog(catalog)
+            original = stock["price"]
+            stock["price"] = original * factor
+            updated, rebuilt = apply_update(catalog, table, snapshot)
+            assert selections(updated) == selections(rebuilt), (stock["ticker"], factor)
+            # update_recommendations leaves the old table untouched, so it is valid again once the price is restored
+            stock["price"] = original
+
+
+def test_random_edits_match_rebuild():
+    rng = random.Random(7)
+    sectors = sorted({s["sector"] for s in ASSET_DATA["stocks"]})
+    edits = {
+        "stocks": [
+            ("price", lambda v: round(v * rng.choice([0.1, 0.5, 1.01, 2, 10]), 2)),
+            ("predicted_return", lambda v: round(v + rng.choice([-0.05, -0.01, 0.01, 0.05]), 3)),
+            ("sector", lambda v: rng.choice(sectors)),
+            ("market_cap", lambda v: rng.choice(["Large", "Mid", "Small"])),
+            ("volatility", lambda v: rng.choice(["Low", "Medium", "High"])),
+        ],
+        "mutual_funds": [
+            ("price", lambda v: round(v * rng.choice([0.5, 1.01, 2]), 2)),
+            ("predicted_return", lambda v: round(v + rng.choice([-0.05, 0.01, 0.05]), 3)),
+            ("category", lambda v: rng.choice(["Large Cap", "Mid Cap", "Small Cap", "Flexi Cap"])),
+        ],
+        "equity_etfs_index_funds": [
+            ("predicted_return", lambda v: round(v + rng.choice([-0.05, 0.05]), 3)),
+        ],
+    }
+
+    for trial in range(100):
+        catalog = copy.deepcopy(ASSET_DATA)
+        table = materialize_recommendations(catalog, build_correlation_matrix(catalog["stocks"]))
+        snapshot = snapshot_catalog(catalog)
+        for _ in range(rng.randint(1, 5)):
+            asset_class = rng.choice(sorted(edits))
+            i = rng.randrange(len(catalog[asset_class]))
+            field, change = rng.choice(edits[asset_class])
+            if rng.random() < 0.5:
+                catalog[asset_class][i][field] = change(catalog[asset_class][i][field])
+            else: # Replaced rather than edited in place
+                catalog[asset_class][i] = {**catalog[asset_class][i], field: change(catalog[asset_class][i][field])}
+        updated, rebuilt = apply_update(catalog, table, snapshot)
+        assert selections(updated) == selections(rebuilt), trial
+
+
+def test_edits_after_snapshot_show_up_in_next_diff():
+    # A refresh diffs against the snapshot it started from, so an edit racing it is not lost
+    catalog = copy.deepcopy(ASSET_DATA)
+    before = snapshot_catalog(catalog)
+    catalog["stocks"][0]["price"] *= 2
+    during = snapshot_catalog(catalog)
+    catalog["stocks"][1]["price"] *= 2
+    assert [new for _, _, _, new, _ in diff_catalogs(before, during)] == [catalog["stocks"][0]]
+    changed = diff_catalogs(during, snapshot_catalog(catalog))
+    assert [(asset_class, new, fields) for asset_class, _, _, new, fields in changed] == [("stocks", catalog["stocks"][1], {"price"})]
@@ -0,0 +1,27 @@
+"""
+Checks which mutual funds allocate_mf_units keeps when the amount can't cover every minimum.
+
+Usage: python -m pytest test_mf_allocation.py
+"""
+from logic import allocate_mf_units
+
+
+def funds(*returns):
+    return [{"name": f"Fund {i + 1}", "price": 10.0, "predicted_return": r} for i, r in enumerate(returns)]
+
+
+def test_small_amount_keeps_the_best_ranked_funds():
+    # Eight equally weighted funds at ₹2,000 get ₹250 each, below the ₹500 minimum: only four fit
+    portfolio = allocate_mf_units(funds(0.15, 0.15, 0.14, 0.14, 0.13, 0.075, 0.07, 0.062), 2000)
+    assert [mf["name"] for mf in portfolio] == ["Fund 1", "Fund 2", "Fund 3", "Fund 4"]
+    assert all(mf["cost"] <= 500 for mf in portfolio)
+
+
+def test_unequal_weights_drop_the_smallest_allocation_first():
+    portfolio = allocate_mf_units(funds(0.15, 0.14, 0.13), 1200, weights=[1, 1, 0.2])
+    assert [mf["name"] for mf in portfolio] == ["Fund 1", "Fund 2"]
+
+
+def test_amount_covering_every_minimum_keeps_all_funds():
+    portfolio = allocate_mf_units(funds(0.15, 0.14, 0.13), 1500)
+    assert [mf["units"] for mf in portfolio] == [50.0, 50.0, 50.0]
@@ -0,0 +1,22 @@
+"""
+Checks that what-if sweeps are reproducible from their seed and only vary the allocation along an amount axis.
+
+Usage: python -m pytest test_sweep.py
+"""
+import random
+
+from asset_data import ASSET_DATA
+from logic import (build_correlation_matrix, materialize_recommendations,
+                   sweep_recommendations)
+
+PROFILE = {"drawdown": 20, "salary": 10, "dependents": 1, "age": 30, "investment_type": "Mutual Funds", "total_investment_amount": 100000}
+
+
+def test_amount_sweep_keeps_one_selection():
+    table = materialize_recommendations(ASSET_DATA, build_correlation_matrix(ASSET_DATA["stocks"]))
+    ranges = {"total_investment_amount": [100000, 200000, 400000]}
+    for seed in range(20):
+        result = sweep_recommendations(PROFILE, ranges, table, rng=random.Random(seed))
+        assert result == sweep_recommendations(PROFILE, ranges, table, rng=random.Random(seed))
+        # Mutual fund variants are drawn once per selection, so every amount buys the same funds
+        assert len({tuple(mf["name"] for mf in portfolio) for portfolio in result["portfolios"]}) == 1, seed